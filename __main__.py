@@ -1,11 +1,23 @@
 import configargparse
 import os
 import os.path
+import sys
 
+from lift.src.extract import EXTRACTORS, SCOPES
 from lift.src.modules import Modules
+from lift.src.output import (
+    output_cycles, output_dumps, output_metrics, output_traversals,
+    output_why
+)
+from lift.src.traversal import PATH_ENGINES
 from lift.src.options import Options
-from lift.src.graph import ImportsGraph
-from lift.src.traversal import Traversal
+from lift.src.profiling import graph_counters, profiler
+from lift.src.graph import GRAPH_BACKENDS, ImportsGraph
+from lift.src.importtime import read_importtime
+from lift.src.reachability import ReachabilityIndex
+from lift.src.server import DEFAULT_ADDRESS, serve
+from lift.src.snapshot import SnapshotError, load_snapshot, save_snapshot
+from lift.src.watch import watch
 
 
 # -----------------------------------------------------------------------------
@@ -25,9 +37,29 @@ def build_arg_parser():
     )
     p.add('--dump-config', action='store_true', dest='dump_config',
           help='dump config vars and their source')
+    p.add('--jobs', default=1, type=int,
+          help='how many processes to use, 0 for one per CPU')
+    p.add('--watch', action='store_true',
+          help='keep running, updating the graph and drawing the '
+               'traversals (.gv, and .json with --output-json) again as '
+               'files change')
+    p.add('--watch-interval', default=0.5, type=float,
+          help='how many seconds to wait between looking for changes')
+    p.add('--watch-dumps', action='store_true',
+          help='with --watch, also write --output-modules, '
+               '--output-imports-graph and --output-externals again after '
+               'each change, which takes a while on a large tree')
+    p.add('--serve', action='store_true',
+          help='keep running, answering queries about the graph')
+    p.add('--serve-address', default=DEFAULT_ADDRESS,
+          help='host:port on localhost, or unix:PATH for a Unix socket')
     g = p.add_argument_group('Modules')
     g.add('--modules-path', default='./**/*.py',
           help='where the python files are located')
+    g.add('--exclude', action='append',
+          help='skip the files and directories matching this glob')
+    g.add('--source-roots', action='append',
+          help='a directory that module names start below, e.g. ./src')
     g.add('--warn-on-duplicate-module', action='store_true',
           help='show warnings when there is a simple name collision')
     g = p.add_argument_group('Import Graph')
@@ -35,8 +67,46 @@ def build_arg_parser():
           help='a file of W0611 warnings, showing which imports are not used')
     g.add('--include-tests', action='store_true',
           help='include tests when making the import graph')
+    g.add('--extractor', default='ast', choices=EXTRACTORS,
+          help='parse every file, or scan for imports and parse if unsure')
+    g.add('--imports-scope', default='all', choices=SCOPES,
+          help='all imports, or only those before the first def or class')
+    g.add('--treat-as-stdlib', action='append',
+          help='leave this package (and its submodules) out of the graph, '
+               'like the standard library')
+    g.add('--include-stdlib', action='store_true',
+          help='keep the standard library in the graph, e.g. to look at '
+               'the standard library itself')
     g.add('--warn-on-ambiguous-edge', action='store_true',
           help='show warnings when there is more than one module match')
+    g.add('--resolution-stats', action='store_true',
+          help='show how often module names were resolved from the cache')
+    g.add('--graph-backend', default='dict', choices=GRAPH_BACKENDS,
+          help='keep the graph as sets per node, freeze it into '
+               'compact integer arrays once it is built, or keep it in '
+               'an SQLite database')
+    g.add('--graph-store', default='',
+          help='the database for --graph-backend sqlite; by default a '
+               'temporary one')
+    g = p.add_argument_group('Cache')
+    g.add('--cache-dir',
+          help='keep the imports of each file here between runs')
+    g.add('--clear-cache', action='store_true',
+          help='discard the cached imports before building the graph')
+    g = p.add_argument_group('Snapshot')
+    g.add('--save-snapshot',
+          help='save the built graph to this file, to load next time')
+    g.add('--load-snapshot',
+          help='load the graph from this file instead of scanning the tree')
+    g.add('--force-snapshot', action='store_true',
+          help='load the snapshot even if it was saved with other options')
+    g = p.add_argument_group('Profiling')
+    g.add('--profile-report',
+          help='write the time and memory of each phase and traversal, '
+               'and counts of what was done, to this JSON file')
+    g.add('--profile-cprofile', action='store_true',
+          help='also run under cProfile, dumping its stats next to the '
+               'report as .pstats')
     g = p.add_argument_group('Traversal')
     g.add('--start-file', required=True,
           help="a file that lists the starting point(s) for the traversal")
@@ -46,72 +116,134 @@ def build_arg_parser():
           help="an optional file that calls out important modules")
     g.add('--max-depth', default=3, type=int,
           help='how many modules away from the entrypoint should be explored')
+    g.add('--path-engine', default='reach', choices=PATH_ENGINES,
+          help='find edges by reachability, by listing every path, '
+               'or both and report any difference')
+    g = p.add_argument_group('Import Time')
+    g.add('--importtime-log',
+          help='the stderr of `python -X importtime`, to label and shade '
+               'each module by what it costs to import')
+    g.add('--importtime-chains', default=0, type=int,
+          help='with --importtime-log, draw only this many of the dearest '
+               'chains of imports from each start')
+    g = p.add_argument_group('Why')
+    g.add('--why', nargs=2, metavar=('START', 'END'),
+          help='instead of the traversals, show the shortest chains of '
+               'imports by which START imports END')
+    g.add('--why-paths', default=1, type=int,
+          help='how many of the shortest chains to show')
+    g.add('--why-output',
+          help='draw the chains in this .gv file instead of printing them')
     g = p.add_argument_group('Output')
     g.add('--output-dot-starts',
           help="write the forward traversals to this directory")
     g.add('--output-dot-ends',
           help="write the backward traversals to this directory")
+    g.add('--output-json', action='store_true',
+          help="also write each traversal as JSON, next to its .gv")
+    g.add('--no-edge-comments', action='store_false', dest='edge_comments',
+          help="leave out the comment saying how each edge's ends relate")
     g.add('--output-externals',
           help="list the package/external dependencies to this file")
     g.add('--output-imports-graph',
           help="write the import graph to this file")
     g.add('--output-modules',
           help="write the modules object to this file")
+    g.add('--output-cycles',
+          help="list the import cycles, with the shortest way round each, "
+               "to this file")
+    g.add('--output-cycles-dot',
+          help="draw each import cycle as its own cluster in this file")
+    g.add('--output-metrics',
+          help="write the fan in and out, depth and transitive imports of "
+               "each module to this file, as JSON if it ends in .json and "
+               "CSV otherwise")
     return p
 
 
-p = build_arg_parser()
-opt = Options()
-cfg = p.parse_args(namespace=opt)
-
-if cfg.dump_config:
-    print(p.format_values())
-
-modules = Modules(cfg)
-
-if cfg.output_modules:
-    modules.dump(cfg.output_modules)
-
-graph = ImportsGraph(cfg, modules)
-if cfg.output_imports_graph:
-    graph.dump(cfg.output_imports_graph)
-
-if cfg.output_externals:
-    graph.dump_externals(cfg.output_externals)
-
-if cfg.output_dot_starts:
-    os.makedirs(cfg.output_dot_starts, exist_ok=True)
-    for i, s in enumerate(cfg.starts, 1):
-        traversal = Traversal(cfg, graph, s, True)
-        print('Output start [{}] {}...'.format(
-            i, traversal.initial_node.modulename), end='')
-        if len(traversal.relations):
-            outfile = os.path.join(
-                cfg.output_dot_starts,
-                traversal.initial_node.basename + '.gv'
-            )
-            traversal.output_dot(outfile)
-            print('{} nodes {} edges'.format(
-                len(traversal.subgraphs.all_nodes),
-                len(traversal.relations)
-            ))
-        else:
-            print('no edges found. Skipping')
-
-if cfg.output_dot_ends:
-    os.makedirs(cfg.output_dot_ends, exist_ok=True)
-    for i, k in enumerate(cfg.ends, 1):
-        print('Output end [{}] {}...'.format(i, k), end='')
-        traversal = Traversal(cfg, graph, k, False)
-        if len(traversal.relations):
-            outfile = os.path.join(
-                cfg.output_dot_ends,
-                k.replace('.', '_') + '.gv'
-            )
-            traversal.output_dot(outfile)
-            print('{} nodes {} edges'.format(
-                len(traversal.subgraphs.all_nodes),
-                len(traversal.relations)
-            ))
-        else:
-            print('no edges found. Skipping')
+def main():
+    p = build_arg_parser()
+    opt = Options()
+    cfg = p.parse_args(namespace=opt)
+
+    if cfg.dump_config:
+        print(p.format_values())
+
+    if cfg.serve and cfg.watch:
+        print('--serve answers from the graph as first built, not watching',
+              file=sys.stderr)
+
+    if cfg.watch and cfg.graph_backend != 'dict':
+        print('--watch updates the graph in place, using the dict backend',
+              file=sys.stderr)
+        cfg.graph_backend = 'dict'
+
+    if cfg.profile_report:
+        profiler.start(cfg.profile_cprofile)
+
+    graph = None
+    if cfg.load_snapshot:
+        try:
+            with profiler.phase('load snapshot'):
+                modules, graph = load_snapshot(cfg.load_snapshot, cfg)
+        except SnapshotError as e:
+            print(e, 'so scanning instead', file=sys.stderr)
+
+    if graph is None:
+        with profiler.phase('discover'):
+            modules = Modules(cfg)
+        with profiler.phase('build'):
+            graph = ImportsGraph(cfg, modules)
+
+    if cfg.importtime_log:
+        with profiler.phase('importtime'):
+            graph.costs = read_importtime(cfg.importtime_log, graph)
+        print('Import times for {} modules'.format(len(graph.costs)))
+
+    with profiler.phase('dumps'):
+        output_dumps(cfg, modules, graph)
+
+    if cfg.save_snapshot:
+        with profiler.phase('save snapshot'):
+            save_snapshot(cfg.save_snapshot, cfg, graph)
+
+    if cfg.why:
+        with profiler.phase('why'):
+            output_why(cfg, graph)
+    else:
+        # A graph in SQLite is only read out whole when something needs
+        # the index; its traversals query the store as they go
+        index = None
+        if graph.store is None or any((
+            cfg.serve, cfg.output_cycles, cfg.output_cycles_dot,
+            cfg.output_metrics
+        )):
+            with profiler.phase('index'):
+                index = ReachabilityIndex(graph)
+
+        if cfg.output_cycles or cfg.output_cycles_dot:
+            with profiler.phase('cycles'):
+                output_cycles(cfg, index)
+
+        if cfg.output_metrics:
+            with profiler.phase('metrics'):
+                output_metrics(cfg, graph, index)
+
+        with profiler.phase('traversals'):
+            output_traversals(cfg, graph, index)
+
+    if cfg.profile_report:
+        profiler.set_counters(graph_counters(modules, graph))
+        profiler.write(cfg.profile_report)
+
+    if cfg.why:
+        return
+
+    if cfg.serve:
+        serve(cfg, graph, index)
+    elif cfg.watch:
+        watch(cfg, modules, graph)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import glob
+import os.path
+import sysconfig
+import time
+
+from lift.src.extract import (
+    SCOPES, Unscannable, extract_imports, read_source, scan_imports
+)
+
+# -----------------------------------------------------------------------------
+# Compare the ast and fast extractors on a corpus
+#
+#   python -m lift.benchmarks.extractors [--modules-path ./src/**/*.py]
+
+
+def build_arg_parser():
+    stdlib = sysconfig.get_paths()['stdlib']
+
+    p = argparse.ArgumentParser(
+        prog='lift.benchmarks.extractors',
+        description='time the ast and fast import extractors'
+    )
+    p.add_argument('--modules-path',
+                   default=os.path.join(stdlib, '**', '*.py'),
+                   help='the files to extract, the stdlib by default')
+    p.add_argument('--imports-scope', default='all', choices=SCOPES)
+    return p
+
+
+def run(paths, scope):
+    sources = [(x, read_source(x)) for x in paths]
+
+    ast_time = 0.0
+    fast_time = 0.0
+    fallbacks = 0
+    syntax_errors = 0
+    mismatches = []
+
+    for path, content in sources:
+        start = time.perf_counter()
+        try:
+            expected = set(extract_imports(content, scope))
+        except SyntaxError:
+            syntax_errors += 1
+            continue
+        ast_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        try:
+            actual = set(scan_imports(content, scope))
+        except Unscannable:
+            fallbacks += 1
+            actual = set(extract_imports(content, scope))
+        fast_time += time.perf_counter() - start
+
+        if actual != expected:
+            mismatches.append((path, actual ^ expected))
+
+    print('files          ', len(sources))
+    print('syntax errors  ', syntax_errors, '(skipped)')
+    print('ast            {:.3f}s'.format(ast_time))
+    print('fast           {:.3f}s'.format(fast_time))
+    print('speedup        {:.1f}x'.format(ast_time / max(fast_time, 1e-9)))
+    print('fallbacks      ', fallbacks)
+    print('mismatches     ', len(mismatches))
+    for path, diff in mismatches:
+        print('\t', path, sorted(diff))
+
+    return not mismatches
+
+
+if __name__ == '__main__':
+    cfg = build_arg_parser().parse_args()
+    paths = glob.glob(cfg.modules_path, recursive=True)
+    if not run(paths, cfg.imports_scope):
+        raise SystemExit(1)
@@ -0,0 +1,82 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from lift.src.file import File
+
+# -----------------------------------------------------------------------------
+# Time and size File nodes on a synthetic tree, no disk needed
+#
+#   python -m lift.benchmarks.files [--files 100000]
+
+
+def build_arg_parser():
+    p = argparse.ArgumentParser(
+        prog='lift.benchmarks.files',
+        description='time and size File nodes on a synthetic tree'
+    )
+    p.add_argument('--files', default=100000, type=int,
+                   help='how many files to make up')
+    p.add_argument('--pairs', default=200000, type=int,
+                   help='how many pairs of files to relate')
+    p.add_argument('--seed', default=0, type=int)
+    return p
+
+
+def synthetic_paths(n, rng):
+    ''' a tree of packages about as deep and bushy as a large repo '''
+    words = ['core', 'api', 'util', 'models', 'service', 'client', 'data',
+             'io', 'web', 'jobs', 'common', 'broker', 'risk', 'pricing']
+    dirs = ['./repo']
+    while len(dirs) < n // 12:
+        parent = rng.choice(dirs)
+        if parent.count('/') < 8:
+            dirs.append('{}/{}{}'.format(
+                parent, rng.choice(words), rng.randrange(10)))
+
+    paths = set()
+    while len(paths) < n:
+        name = '__init__' if rng.random() < 0.1 else '{}_{}'.format(
+            rng.choice(words), rng.randrange(100))
+        paths.add('{}/{}.py'.format(rng.choice(dirs), name))
+    return sorted(paths)
+
+
+def timed(label, f):
+    start = time.perf_counter()
+    result = f()
+    print('{:<15}{:.3f}s'.format(label, time.perf_counter() - start))
+    return result
+
+
+def run(cfg):
+    rng = random.Random(cfg.seed)
+    paths = synthetic_paths(cfg.files, rng)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    files = timed('construct', lambda: [File(x) for x in paths])
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print('{:<15}{:.1f} MB, {} bytes a file'.format(
+        'memory', size / 1e6, size // len(files)))
+
+    # Half the pairs anywhere, half neighbours, as imports tend to be
+    half = cfg.pairs // 2
+    pairs = [(rng.choice(files), rng.choice(files)) for _ in range(half)]
+    for _ in range(cfg.pairs - half):
+        i = rng.randrange(len(files) - 1)
+        pairs.append((files[i], files[i + 1]))
+
+    timed('names', lambda: [
+        (x.basename, x.modulename, x.gv_name, x.dotted_path) for x in files
+    ])
+    timed('distance', lambda: [a.distance(b) for a, b in pairs])
+    timed('is_ancestor', lambda: [a.is_ancestor(b) for a, b in pairs])
+    timed('relative_label', lambda: [a.relative_label(b) for a, b in pairs])
+    timed('hash and eq', lambda: len(set(files).intersection(paths)))
+
+
+if __name__ == '__main__':
+    run(build_arg_parser().parse_args())
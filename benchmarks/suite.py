@@ -0,0 +1,242 @@
+import argparse
+import io
+import json
+import os
+import os.path
+import platform
+import sysconfig
+import tempfile
+import time
+
+from lift.__main__ import build_arg_parser as build_lift_parser
+from lift.benchmarks.synthetic import generate
+from lift.src.graph import ImportsGraph
+from lift.src.modules import Modules
+from lift.src.options import Options
+from lift.src.reachability import ReachabilityIndex
+from lift.src.traversal import Traversal
+
+# -----------------------------------------------------------------------------
+# Time the stages of a run, on a synthetic tree or the standard library
+#
+#   python -m lift.benchmarks.suite [--corpus stdlib] [--output now.json]
+#                                   [--baseline then.json]
+#
+# Each stage is run --repeat times and the best time kept.  With a
+# baseline, a stage more than --threshold slower than it was is reported,
+# and the exit status is 1.
+
+RESULTS_VERSION = 1
+
+# Differences below this many seconds are noise, whatever the ratio
+NOISE = 0.005
+
+
+def build_arg_parser():
+    p = argparse.ArgumentParser(
+        prog='lift.benchmarks.suite',
+        description='time building the graph and drawing traversals'
+    )
+    p.add_argument('--corpus', default='synthetic',
+                   choices=('synthetic', 'stdlib'),
+                   help='a generated tree, or the standard library')
+    p.add_argument('--files', default=2000, type=int,
+                   help='how many files to generate')
+    p.add_argument('--depth', default=4, type=int,
+                   help='how deep generated packages nest')
+    p.add_argument('--fanout', default=6, type=int,
+                   help='how many imports each generated module has')
+    p.add_argument('--ambiguous', default=0.1, type=float,
+                   help='the share of generated modules with a shared '
+                        'basename')
+    p.add_argument('--cycles', default=0.05, type=float,
+                   help='the share of generated modules that close a cycle')
+    p.add_argument('--seed', default=0, type=int)
+    p.add_argument('--max-depths', default='1,3,5',
+                   help='the --max-depth values to traverse with')
+    p.add_argument('--traversals', default=5, type=int,
+                   help='how many starts and ends to traverse from')
+    p.add_argument('--repeat', default=3, type=int,
+                   help='how many times to run each stage')
+    p.add_argument('--output',
+                   help='write the results to this JSON file')
+    p.add_argument('--baseline',
+                   help='compare with the results in this JSON file')
+    p.add_argument('--threshold', default=0.25, type=float,
+                   help='how much slower than the baseline is a regression')
+    return p
+
+
+def lift_options(modules_path, include_stdlib):
+    ''' lift's defaults, without reading its config.ini '''
+    cfg = build_lift_parser().parse_args([
+        '--modules-path', modules_path,
+        '--start-file', os.devnull,
+        '--end-file', os.devnull,
+    ], namespace=Options(), config_file_contents='')
+    cfg.include_stdlib = include_stdlib
+    cfg.starts = []
+    cfg.ends = []
+    return cfg
+
+
+def best(repeat, f, setup=None):
+    ''' (fewest seconds, last result) of running f repeat times
+
+    With setup, f is given what setup returns, made afresh each time and
+    not timed.
+    '''
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        result = f(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def representative(graph, n):
+    ''' the n files importing most, and the n externals imported most '''
+    c = graph.compact_graph()
+    starts = sorted(
+        (i for i in range(c.n_local) if not c.nodes[i].is_init),
+        key=lambda i: (-c.imports.degree(i), c.keys[i])
+    )
+    ends = sorted(
+        range(c.n_local, len(c)),
+        key=lambda i: (-c.imported_by.degree(i), c.keys[i])
+    )
+    return [c.keys[i] for i in starts[:n]], [c.keys[i] for i in ends[:n]]
+
+
+def run(cfg, modules_path, include_stdlib):
+    options = lift_options(modules_path, include_stdlib)
+    timings = {}
+
+    def modules():
+        m = Modules(options)
+        m.trie
+        return m
+
+    timings['modules'], m = best(cfg.repeat, modules)
+    timings['graph'], graph = best(
+        cfg.repeat, lambda x: ImportsGraph(options, x), modules
+    )
+    timings['index'], _ = best(cfg.repeat, lambda: ReachabilityIndex(graph))
+
+    starts, ends = representative(graph, cfg.traversals)
+    options.starts = starts
+    options.ends = ends
+
+    def traverse(index, forward):
+        return [
+            Traversal(options, graph, x, forward, index)
+            for x in (starts if forward else ends)
+        ]
+
+    # A fresh index each time, so its distances are not remembered
+    def index():
+        return ReachabilityIndex(graph)
+
+    traversals = []
+    for depth in [int(x) for x in cfg.max_depths.split(',')]:
+        options.max_depth = depth
+        for forward, name in ((True, 'start'), (False, 'end')):
+            key = 'traversal/{}/{}'.format(name, depth)
+            timings[key], done = best(
+                cfg.repeat, lambda x: traverse(x, forward), index
+            )
+            traversals.extend(done)
+
+    with tempfile.TemporaryDirectory() as out:
+        def output_dot():
+            for i, t in enumerate(traversals):
+                t.output_dot(os.path.join(out, '{}.gv'.format(i)))
+
+        timings['output_dot'], _ = best(cfg.repeat, output_dot)
+
+    c = graph.compact_graph()
+    return {
+        'files': len(m.files),
+        'edges': len(c.imports.targets),
+        'externals': len(c) - c.n_local,
+        'timings': timings,
+    }
+
+
+def compare(results, baseline, threshold):
+    ''' print each stage against the baseline, returning the regressions '''
+    regressions = []
+    then = baseline['timings']
+    print('{:<24}{:>10}{:>10}{:>8}'.format('stage', 'then', 'now', 'ratio'))
+    for key, now in sorted(results['timings'].items()):
+        if key not in then:
+            continue
+        ratio = now / max(then[key], 1e-9)
+        slower = ratio > 1 + threshold and now - then[key] > NOISE
+        print('{:<24}{:>10.4f}{:>10.4f}{:>8.2f}{}'.format(
+            key, then[key], now, ratio, '  SLOWER' if slower else ''))
+        if slower:
+            regressions.append(key)
+
+    if baseline.get('corpus') != results['corpus']:
+        print('the baseline was run on another corpus, so this is only '
+              'a rough guide')
+    return regressions
+
+
+def main(cfg):
+    # Paths are relative, from two levels above the modules, as lift is
+    # usually run, so that every module has a cluster to go in
+    here = os.getcwd()
+    if cfg.corpus == 'stdlib':
+        corpus = {'name': 'stdlib', 'version': platform.python_version()}
+        lib, version = os.path.split(sysconfig.get_paths()['stdlib'])
+        top, lib = os.path.split(lib)
+        os.chdir(top)
+        try:
+            results = run(cfg, './{}/{}/**/*.py'.format(lib, version), True)
+        finally:
+            os.chdir(here)
+    else:
+        corpus = {
+            'name': 'synthetic', 'files': cfg.files, 'depth': cfg.depth,
+            'fanout': cfg.fanout, 'ambiguous': cfg.ambiguous,
+            'cycles': cfg.cycles, 'seed': cfg.seed,
+        }
+        with tempfile.TemporaryDirectory() as root:
+            generate(os.path.join(root, 'repo'), cfg.files, cfg.depth,
+                     cfg.fanout, cfg.ambiguous, cfg.cycles, cfg.seed)
+            os.chdir(root)
+            try:
+                results = run(cfg, './repo/**/*.py', False)
+            finally:
+                os.chdir(here)
+
+    results.update({
+        'version': RESULTS_VERSION,
+        'corpus': corpus,
+        'max_depths': cfg.max_depths,
+        'python': platform.python_version(),
+    })
+    print('{} files, {} edges, {} externals'.format(
+        results['files'], results['edges'], results['externals']))
+
+    if cfg.output:
+        with io.open(cfg.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if cfg.baseline:
+        with io.open(cfg.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, cfg.threshold):
+            raise SystemExit(1)
+    else:
+        for key, seconds in sorted(results['timings'].items()):
+            print('{:<24}{:.4f}s'.format(key, seconds))
+
+
+if __name__ == '__main__':
+    main(build_arg_parser().parse_args())
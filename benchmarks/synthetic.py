@@ -0,0 +1,133 @@
+import io
+import os
+import os.path
+import random
+
+# -----------------------------------------------------------------------------
+# Synthetic - write a made-up source tree, shaped like a large repo
+#
+# Packages nest up to a given depth, each with an __init__.py.  Modules
+# import a few others, mostly nearby, some anywhere, some by a basename
+# that many packages share (so resolving them is ambiguous), and some
+# from the standard library or third party packages.  A share of imports
+# is returned, closing a cycle.
+
+# Basenames shared across packages, imported by their last component only
+SHARED = ['utils', 'models', 'base', 'config', 'helpers', 'types',
+          'errors', 'client']
+
+STDLIB = ['os', 'sys', 'json', 're', 'collections', 'functools',
+          'itertools', 'logging', 'typing', 'dataclasses']
+
+THIRD_PARTY = ['requests', 'numpy', 'yaml', 'attr', 'sqlalchemy',
+               'click', 'pydantic', 'boto3']
+
+BODY = '''
+
+class Thing{i}(object):
+    def __init__(self, value):
+        self.value = value
+
+    def scaled(self, factor):
+        return Thing{i}(self.value * factor)
+
+
+def make_{i}(values):
+    return [Thing{i}(x).scaled({i}) for x in values]
+'''
+
+
+def make_tree(files, depth, ambiguous, rng):
+    ''' (packages, modules) as lists of dotted names '''
+    packages = ['pkg{}'.format(i) for i in range(max(1, files // 200))]
+    target = max(len(packages), files // 10)
+    while len(packages) < target:
+        parent = rng.choice(packages)
+        if parent.count('.') + 1 < depth:
+            packages.append('{}.sub{}'.format(parent, len(packages)))
+
+    modules = set()
+    while len(packages) + len(modules) < files:
+        package = rng.choice(packages)
+        if rng.random() < ambiguous:
+            name = rng.choice(SHARED)
+        else:
+            name = 'mod{}'.format(len(modules))
+        modules.add('{}.{}'.format(package, name))
+
+    return packages, sorted(modules)
+
+
+def pick_imports(module, packages, modules, by_package, fanout, rng):
+    ''' the names module imports '''
+    package = module.rpartition('.')[0]
+    imports = []
+    for _ in range(fanout):
+        r = rng.random()
+        if r < 0.5:
+            # A neighbour, in this package or the one above
+            near = package
+            if '.' in package and rng.random() < 0.3:
+                near = package.rpartition('.')[0]
+            candidates = by_package.get(near) or modules
+            imports.append(rng.choice(candidates))
+        elif r < 0.7:
+            imports.append(rng.choice(modules))
+        elif r < 0.8:
+            imports.append(rng.choice(SHARED))
+        elif r < 0.85:
+            imports.append(rng.choice(packages))
+        elif r < 0.95:
+            imports.append(rng.choice(STDLIB))
+        else:
+            imports.append(rng.choice(THIRD_PARTY))
+
+    return [x for x in imports if x != module]
+
+
+def write_module(path, imports, i, rng):
+    lines = []
+    for name in imports:
+        if '.' in name and rng.random() < 0.5:
+            lines.append('from {} import make_{}\n'.format(name, i))
+        else:
+            lines.append('import {}\n'.format(name))
+
+    with io.open(path, 'w') as f:
+        f.write(''.join(lines))
+        f.write(BODY.format(i=i))
+
+
+def generate(root, files=2000, depth=4, fanout=6, ambiguous=0.1,
+             cycles=0.05, seed=0):
+    ''' write about `files` .py files below root, returning how many '''
+    rng = random.Random(seed)
+    packages, modules = make_tree(files, depth, ambiguous, rng)
+
+    by_package = {}
+    for m in modules:
+        by_package.setdefault(m.rpartition('.')[0], []).append(m)
+
+    imports = dict(
+        (m, pick_imports(m, packages, modules, by_package, fanout, rng))
+        for m in modules
+    )
+
+    # Close some cycles, by importing back a module that imports this one
+    for m in modules:
+        if rng.random() < cycles:
+            local = [x for x in imports[m] if x in imports]
+            if local:
+                imports[rng.choice(local)].append(m)
+
+    for package in packages:
+        d = os.path.join(root, *package.split('.'))
+        os.makedirs(d, exist_ok=True)
+        with io.open(os.path.join(d, '__init__.py'), 'w') as f:
+            f.write('')
+
+    for i, m in enumerate(modules):
+        path = os.path.join(root, *m.split('.')) + '.py'
+        write_module(path, imports[m], i, rng)
+
+    return len(packages) + len(modules)
@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import os.path
+import sys
+
+from .extract import ImportResult, digest_source, read_source
+
+# -----------------------------------------------------------------------------
+# Cache - the imports of each file, persisted between runs
+
+CACHE_VERSION = 1
+CACHE_FILE = 'imports.json'
+
+
+class ImportCache(object):
+    def __init__(self, options):
+        self.options = options
+        self.path = os.path.join(options.cache_dir, CACHE_FILE)
+        self.entries = {}
+        self.touched = set()
+        self.dirty = False
+
+        if options.clear_cache:
+            self.clear()
+        else:
+            self.load()
+
+    @property
+    def signature(self):
+        ''' anything that changes what is stored for a file '''
+        return {
+            'version': CACHE_VERSION,
+            'extractor': self.options.extractor,
+            'imports_scope': self.options.imports_scope
+        }
+
+    # --------------------------------------------------------------------------
+    # Persistence
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.entries = {}
+        self.dirty = True
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with io.open(self.path, 'r') as f:
+                o = json.load(f)
+        except (OSError, ValueError) as e:
+            print(self.path, 'is not a usable cache:', e, file=sys.stderr)
+            return
+
+        if o.get('signature') != self.signature:
+            self.dirty = True
+            return
+
+        self.entries = o['files']
+
+    def save(self):
+        # Forget files that have disappeared since they were cached
+        for k in [k for k in self.entries if k not in self.touched]:
+            if not os.path.exists(k):
+                del self.entries[k]
+                self.dirty = True
+
+        if not self.dirty:
+            return
+
+        os.makedirs(self.options.cache_dir, exist_ok=True)
+        o = {'signature': self.signature, 'files': self.entries}
+        tmp = self.path + '.tmp'
+        with io.open(tmp, 'w') as f:
+            json.dump(o, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    # --------------------------------------------------------------------------
+    # Lookup
+
+    def lookup(self, file):
+        ''' the cached ImportResult for this file, or None if it changed '''
+        k = os.path.abspath(file)
+        self.touched.add(k)
+
+        entry = self.entries.get(k)
+        if entry is None:
+            return None
+
+        st = os.stat(file)
+        if entry['mtime'] != st.st_mtime_ns or entry['size'] != st.st_size:
+            # The timestamp moved, but the content may be the same
+            digest = digest_source(read_source(file))
+            if digest != entry['digest']:
+                return None
+            entry['mtime'] = st.st_mtime_ns
+            entry['size'] = st.st_size
+            self.dirty = True
+
+        return ImportResult(entry['imports'], entry['error'], entry['digest'])
+
+    def store(self, file, result):
+        k = os.path.abspath(file)
+        self.touched.add(k)
+
+        st = os.stat(file)
+        self.entries[k] = {
+            'mtime': st.st_mtime_ns,
+            'size': st.st_size,
+            'digest': result.digest,
+            'imports': result.imports,
+            'error': result.error
+        }
+        self.dirty = True
@@ -0,0 +1,96 @@
+import argparse
+import http.client
+import json
+import socket
+import sys
+
+from .server import DEFAULT_ADDRESS, parse_address
+
+# -----------------------------------------------------------------------------
+# Client - ask a running `--serve` about the graph
+#
+#     client = Client('127.0.0.1:8765')
+#     client.query('imported_by', module='lib.pdb')
+#     client.batch([{'op': 'imports', 'module': x} for x in names])
+#
+# or from the shell
+#
+#     python -m lift.src.client imported_by module=lib.pdb
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class Client(object):
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        self.family, self.address = parse_address(address)
+        self.timeout = timeout
+
+    def connection(self):
+        if self.family == socket.AF_UNIX:
+            return UnixHTTPConnection(self.address, self.timeout)
+        host, port = self.address
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def post(self, request):
+        conn = self.connection()
+        try:
+            conn.request(
+                'POST', '/query', json.dumps(request),
+                {'Content-Type': 'application/json'}
+            )
+            return json.loads(conn.getresponse().read())
+        finally:
+            conn.close()
+
+    def batch(self, queries):
+        ''' a {"result": ...} or {"error": ...} per query, in order '''
+        return self.post(list(queries))
+
+    def query(self, op, **args):
+        ''' the result of one query, raising ValueError on an error '''
+        args['op'] = op
+        answer = self.post(args)
+        if 'error' in answer:
+            raise ValueError(answer['error'])
+        return answer['result']
+
+
+def main():
+    p = argparse.ArgumentParser(
+        prog='python -m lift.src.client',
+        description='query a graph served by `python -m lift --serve`'
+    )
+    p.add_argument('--address', default=DEFAULT_ADDRESS,
+                   help='host:port or unix:PATH of the server')
+    p.add_argument('op', help='imports, imported_by, reach, paths, ...')
+    p.add_argument('args', nargs='*', metavar='NAME=VALUE',
+                   help='arguments of the query, the values read as JSON '
+                        'where they can be')
+    args = p.parse_args()
+
+    query = {'op': args.op}
+    for arg in args.args:
+        name, _, value = arg.partition('=')
+        try:
+            query[name] = json.loads(value)
+        except ValueError:
+            query[name] = value
+
+    answer = Client(args.address).post(query)
+    json.dump(answer, sys.stdout, indent=2, sort_keys=True)
+    print()
+    return 1 if 'error' in answer else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+from array import array
+from collections.abc import Mapping
+
+# -----------------------------------------------------------------------------
+# Compact - the graph as integer ids and compressed sparse rows
+#
+# Every local module and external is interned to an id, locals first.  The
+# imports (and imported_by) of node i are the ids
+#
+#     targets[offsets[i]:offsets[i + 1]]
+#
+# which costs four bytes an edge instead of a slot in a per-node set.
+
+
+class Adjacency(object):
+    def __init__(self, rows=()):
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        for row in rows:
+            self.targets.extend(sorted(row))
+            self.offsets.append(len(self.targets))
+
+    @classmethod
+    def from_arrays(cls, offsets, targets):
+        a = cls()
+        a.offsets = offsets
+        a.targets = targets
+        return a
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def degree(self, i):
+        return self.offsets[i + 1] - self.offsets[i]
+
+    @property
+    def nbytes(self):
+        return (
+            self.offsets.itemsize * len(self.offsets) +
+            self.targets.itemsize * len(self.targets)
+        )
+
+
+class CompactGraph(object):
+    def __init__(self, graph=None):
+        self.keys = []
+        self.nodes = []
+        self.ids = {}
+        if graph is None:
+            return
+
+        for k, ign in graph.nodes.items():
+            self.intern(k, ign.node)
+        self.n_local = len(self.keys)
+        for k, ign in graph.externals.items():
+            self.intern(k, ign.node)
+
+        ids = self.ids
+        self.imports = Adjacency(
+            [ids[str(x)] for x in graph[k].imports] for k in self.keys
+        )
+        self.imported_by = Adjacency(
+            [ids[str(x)] for x in graph[k].imported_by] for k in self.keys
+        )
+
+    @classmethod
+    def from_adjacency(cls, keys, nodes, n_local, imports, imported_by):
+        c = cls()
+        c.keys = keys
+        c.nodes = nodes
+        c.ids = dict(zip(keys, range(len(keys))))
+        c.n_local = n_local
+        c.imports = imports
+        c.imported_by = imported_by
+        return c
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return str(key) in self.ids
+
+    def intern(self, key, node):
+        self.ids[key] = len(self.keys)
+        self.keys.append(key)
+        self.nodes.append(node)
+
+    def id_of(self, key):
+        return self.ids.get(str(key))
+
+    def is_local(self, i):
+        return i < self.n_local
+
+    def successors(self, i, forward=True):
+        return self.imports[i] if forward else self.imported_by[i]
+
+    @property
+    def nbytes(self):
+        return self.imports.nbytes + self.imported_by.nbytes
+
+
+class CompactNodes(Mapping):
+    ''' a read-only view of the compact graph, shaped like a nodes dict '''
+
+    def __init__(self, compact, factory, lo, hi):
+        self.compact = compact
+        self.factory = factory
+        self.lo = lo
+        self.hi = hi
+
+    def __contains__(self, key):
+        i = self.compact.ids.get(key)
+        return i is not None and self.lo <= i < self.hi
+
+    def __getitem__(self, key):
+        i = self.compact.ids.get(key)
+        if i is None or not self.lo <= i < self.hi:
+            raise KeyError(key)
+
+        c = self.compact
+        return self.factory(
+            c.nodes[i],
+            tuple(c.nodes[j] for j in c.imports[i]),
+            tuple(c.nodes[j] for j in c.imported_by[i])
+        )
+
+    def __iter__(self):
+        return iter(self.compact.keys[self.lo:self.hi])
+
+    def __len__(self):
+        return self.hi - self.lo
@@ -0,0 +1,118 @@
+import json
+
+from .file import File
+from .manifest import write_if_changed
+
+# -----------------------------------------------------------------------------
+# Cycles - the strongly connected components of the imports
+#
+# The components are the ones ReachabilityIndex condenses, found once by
+# Tarjan's algorithm.  Each one of more than one module (or a module that
+# imports itself) is a cycle; to show how it closes, the shortest cycle
+# through its first member is found by a BFS that stays inside it, so the
+# whole report is linear in the size of the graph.
+
+
+def shortest_cycle(compact, members, root):
+    ''' the ids of a shortest cycle through root, staying within members '''
+    parent = {root: None}
+    frontier = [root]
+    while frontier:
+        following = []
+        for u in frontier:
+            for v in compact.imports[u]:
+                if v == root:
+                    cycle = [u]
+                    while parent[u] is not None:
+                        u = parent[u]
+                        cycle.append(u)
+                    cycle.reverse()
+                    return cycle
+                if v in members and v not in parent:
+                    parent[v] = u
+                    following.append(v)
+        frontier = following
+    return None
+
+
+def import_cycles(index):
+    ''' [(member ids, cycle ids), ...], largest first '''
+    compact = index.compact
+    cycles = []
+    for component in index.components:
+        if len(component) == 1:
+            i = component[0]
+            if i not in compact.imports[i]:
+                continue
+
+        # A stable representative, whatever order Tarjan found them in
+        members = sorted(component, key=compact.keys.__getitem__)
+        cycle = shortest_cycle(compact, set(members), members[0])
+        cycles.append((members, cycle))
+
+    cycles.sort(key=lambda x: (-len(x[0]), compact.keys[x[0][0]]))
+    return cycles
+
+
+class CycleReport(object):
+    def __init__(self, index):
+        self.compact = index.compact
+        self.cycles = import_cycles(index)
+
+    def __len__(self):
+        return len(self.cycles)
+
+    def inner_edges(self, members):
+        ''' the (u, v) imports that stay within members '''
+        inside = set(members)
+        return [
+            (u, v) for u in members for v in self.compact.imports[u]
+            if v in inside
+        ]
+
+    def json(self):
+        keys = self.compact.keys
+        o = []
+        for members, cycle in self.cycles:
+            o.append({
+                'size': len(members),
+                'edges': len(self.inner_edges(members)),
+                'members': [keys[i] for i in members],
+                'cycle': [keys[i] for i in cycle],
+            })
+        return json.dumps(o, indent=2, sort_keys=True) + '\n'
+
+    def dot(self):
+        ''' a cluster per cycle, the shortest cycle through it in bold '''
+        nodes = self.compact.nodes
+        out = []
+        w = out.append
+        w('digraph cycles {\n')
+        w('\trankdir=LR;\n')
+        w('\tnode [fontsize=10 shape="rect"]\n')
+        w('\tedge [fontsize=9]\n')
+        w('\n')
+
+        for c, (members, cycle) in enumerate(self.cycles, 1):
+            w('\tsubgraph cluster_{} {{\n'.format(c))
+            w('\t\tlabel="cycle {}: {} modules"\n\n'.format(c, len(members)))
+            for i in members:
+                n = nodes[i]
+                label = n.modulename if isinstance(n, File) else n
+                w('\t\tn{} [label="{}"]\n'.format(i, label))
+            w('\t}\n\n')
+
+        for members, cycle in self.cycles:
+            bold = set(zip(cycle, cycle[1:] + cycle[:1]))
+            for u, v in self.inner_edges(members):
+                w('\tn{} -> n{}{}\n'.format(
+                    u, v, ' [penwidth=2]' if (u, v) in bold else ''
+                ))
+        w('}\n')
+        return ''.join(out)
+
+    def dump(self, outfile):
+        write_if_changed(outfile, self.json())
+
+    def dump_dot(self, outfile):
+        write_if_changed(outfile, self.dot())
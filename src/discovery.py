@@ -0,0 +1,156 @@
+import fnmatch
+import glob
+import os
+import os.path
+import re
+
+from .file import File
+
+# -----------------------------------------------------------------------------
+# Discovery - walk the tree once, finding the files to analyze
+
+# Directories that never hold code worth analyzing
+PRUNED_DIRS = frozenset([
+    '__pycache__',
+    'dist-packages',
+    'node_modules',
+    'site-packages',
+])
+
+# The marker file of a virtual environment
+VENV_MARKER = 'pyvenv.cfg'
+
+MAGIC = re.compile('[*?[]')
+
+
+class Discovery(object):
+    def __init__(self, options):
+        self.options = options
+        self.excludes = options.exclude or []
+
+    def __iter__(self):
+        root, recursive, pattern = self.split_modules_path()
+        if pattern is None:
+            paths = self.glob()
+        else:
+            paths = self.walk(root, recursive, pattern, False)
+
+        for path in paths:
+            node = File(path)
+            if node.is_root:
+                continue
+            if node.is_test and not self.options.include_tests:
+                continue
+            yield node
+
+    def split_modules_path(self):
+        ''' (root, recursive, file pattern), or a None pattern for glob '''
+        parts = self.options.modules_path.split('/')
+        i = 0
+        while i < len(parts) - 1 and not MAGIC.search(parts[i]):
+            i += 1
+
+        root = '/'.join(parts[:i])
+        rest = parts[i:]
+        if len(rest) == 1:
+            return root, False, rest[0]
+        if len(rest) == 2 and rest[0] == '**' and '**' not in rest[1]:
+            return root, True, rest[1]
+        return root, False, None
+
+    # --------------------------------------------------------------------------
+    # Pruning
+
+    def is_excluded(self, name, path):
+        for pattern in self.excludes:
+            if fnmatch.fnmatch(name, pattern):
+                return True
+            if fnmatch.fnmatch(path, pattern):
+                return True
+        return False
+
+    def is_pruned(self, name, path):
+        if name.startswith('.') or name in PRUNED_DIRS:
+            return True
+        if name == 'test' and not self.options.include_tests:
+            return True
+        return self.is_excluded(name, path)
+
+    # --------------------------------------------------------------------------
+    # Walking
+
+    def glob(self):
+        ''' anything more elaborate than `root/**/pattern` '''
+        for path in glob.glob(self.options.modules_path, recursive=True):
+            parts = path.split('/')
+            if any(self.is_pruned(x, path) for x in parts[1:-1]):
+                continue
+            if not self.is_excluded(parts[-1], path):
+                yield path
+
+    def walk(self, root, recursive, pattern, nested=True):
+        ''' the same files, in the same order, as `glob.glob` would find '''
+        try:
+            with os.scandir(root or '.') as it:
+                entries = list(it)
+        except OSError:
+            return
+
+        if nested and any(x.name == VENV_MARKER for x in entries):
+            return
+
+        hidden = not pattern.startswith('.')
+        dirs = []
+        for entry in entries:
+            name = entry.name
+            if hidden and name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if recursive and not self.is_pruned(name, path):
+                    dirs.append(path)
+            elif fnmatch.fnmatch(name, pattern):
+                if not self.is_excluded(name, path):
+                    yield path
+
+        for path in dirs:
+            yield from self.walk(path, recursive, pattern)
+
+    def directories(self):
+        ''' the directories a walk looks in, to watch for new files '''
+        root, recursive, pattern = self.split_modules_path()
+        recursive = recursive or pattern is None
+        root = root or '.'
+
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            if directory != root and any(
+                x.name == VENV_MARKER for x in entries
+            ):
+                continue
+
+            yield directory
+            if not recursive:
+                continue
+            for entry in entries:
+                path = os.path.join(directory, entry.name)
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir and not self.is_pruned(entry.name, path):
+                    pending.append(path)
+
+
+def discover(options):
+    return list(Discovery(options))
@@ -0,0 +1,215 @@
+import io
+import json
+
+from .file import File
+from .importtime import HEAT_LEVELS, cost_label, heat
+
+# -----------------------------------------------------------------------------
+# Dot - render a Traversal, as DOT or as JSON
+#
+# Everything goes into one list of strings that is joined and written once.
+# Nodes and edges come out sorted, so the same traversal always gives the
+# same bytes.
+
+
+def edge_kind(a, b):
+    ''' how two local modules are related, and the detail for a comment '''
+    if a.is_sibling(b):
+        return 'sibling', a.dotted_path
+    elif a.is_ancestor(b):
+        return 'family', a.relative_label(b)
+    elif b.is_ancestor(a):
+        return 'family', b.relative_label(a)
+    return 'neighbors', a.distance(b)
+
+
+class TraversalWriter(object):
+    def __init__(self, traversal, edge_comments=True):
+        self.traversal = traversal
+        self.edge_comments = edge_comments
+        self.roots = frozenset(traversal.roots)
+        self.highlights = frozenset(traversal.options.highlights)
+
+        self.costs = traversal.graph.costs
+        self.hottest = max(
+            (x.cumulative_us for x in self.costs.values()), default=0
+        )
+
+    def relations(self):
+        return sorted(
+            self.traversal.relations, key=lambda r: (r.start, str(r.end))
+        )
+
+    def role(self, n):
+        if n in self.roots:
+            return 'root'
+        elif n in self.highlights:
+            return 'highlight'
+        return None
+
+    def cost_attrs(self, key, label, fill=True):
+        ''' the label and, unless already filled, shade of key's cost '''
+        cost = self.costs.get(key)
+        if cost is None:
+            return []
+        attrs = ['label="{}\\n{}"'.format(label, cost_label(cost))]
+        if fill:
+            attrs += [
+                'style=filled',
+                'colorscheme=reds{}'.format(HEAT_LEVELS),
+                'fillcolor={}'.format(heat(cost, self.hottest)),
+            ]
+        return attrs
+
+    # --------------------------------------------------------------------------
+    # DOT
+
+    def dot(self):
+        out = []
+        w = out.append
+        visited_sg = set()
+        styles = {
+            'root': 'style=filled fillcolor=gold',
+            'highlight': 'style=filled fillcolor=skyblue1',
+        }
+
+        # The keys of the nodes drawn with their cost
+        costed = set()
+
+        def node_attrs(n, label=None, shape=None):
+            role = self.role(n)
+            attrs = self.cost_attrs(str(n), label or n.gv_name, role is None)
+            if attrs:
+                costed.add(str(n))
+            elif label:
+                attrs = ['label="{}"'.format(label)]
+            if shape:
+                attrs.insert(1, 'shape="{}"'.format(shape))
+            if role:
+                attrs.insert(0, styles[role])
+            return ' [{}]'.format(' '.join(attrs)) if attrs else ''
+
+        def output_sg(sg, d, parent_label):
+            if sg in visited_sg:
+                return
+
+            tabs = '\t' * d
+            label = sg.label.replace(parent_label, '').strip('.')
+
+            if sg.size == 1 and not sg.sg_children:
+                n = sg.synecdoche
+                w('{}{}{}\n\n'.format(tabs, n.gv_name, node_attrs(
+                    n, '{}.{}'.format(label, n.basename), 'component'
+                )))
+            else:
+                w('{}subgraph cluster_{} {{\n'.format(tabs, sg.id))
+                w('{}\tlabel="{}"\n\n'.format(tabs, label))
+                for csg in sg.sg_children:
+                    output_sg(csg, d + 1, sg.label)
+                for n in sorted(sg.nodes):
+                    w('{}\t{}{}\n'.format(tabs, n.gv_name, node_attrs(n)))
+                w('{}}}\n\n'.format(tabs))
+
+            visited_sg.add(sg)
+
+        w('digraph imports {\n')
+        w('\trankdir=LR;\n')
+        w('\tcompound=true\n')
+        w('\tnode [fontsize=10 shape="rect"]\n')
+        w('\tedge [fontsize=9]\n')
+        w('\n\n')
+
+        subgraphs = self.traversal.subgraphs
+        for k in sorted(subgraphs.keys(), key=lambda x: (len(x), x)):
+            output_sg(subgraphs[k], 1, '')
+        assert(all(
+            str(n) in costed for n in subgraphs.all_nodes
+            if str(n) in self.costs
+        ))
+
+        w('\n\n')
+        for p in sorted(self.traversal.sinks):
+            label = self.cost_attrs(p, p, False) or ['label="{}"'.format(p)]
+            w('\t{} [{} style=filled fillcolor=salmon]\n'.format(
+                p.replace('.', '_'), label[0]))
+
+        w('\n\n')
+        for r in self.relations():
+            assert(isinstance(r.start, File))
+            a = r.start.gv_name
+            # Both are local modules
+            if isinstance(r.end, File):
+                b = r.end.gv_name
+                comment = ''
+                if self.edge_comments:
+                    comment = ' /* {} {} */'.format(*edge_kind(r.start, r.end))
+            else:
+                b = r.end.replace('.', '_')
+                comment = ' /* ext */' if self.edge_comments else ''
+            w('\t{} -> {}{}\n'.format(a, b, comment))
+
+        w('}\n')
+        return ''.join(out)
+
+    # --------------------------------------------------------------------------
+    # JSON
+
+    def json(self):
+        t = self.traversal
+        subgraphs = t.subgraphs
+
+        parents = {}
+        for sg in subgraphs.values():
+            for csg in sg.sg_children:
+                parents[csg.label] = sg.id
+
+        nodes = []
+        for n in sorted(subgraphs.all_nodes):
+            nodes.append({
+                'file': str(n),
+                'name': n.gv_name,
+                'cluster': subgraphs.all_nodes[n].id,
+                'role': self.role(n),
+            })
+            cost = self.costs.get(str(n))
+            if cost is not None:
+                nodes[-1].update(cost._asdict())
+
+        edges = []
+        for r in self.relations():
+            if isinstance(r.end, File):
+                kind, detail = edge_kind(r.start, r.end)
+            else:
+                kind, detail = 'ext', None
+            edges.append({
+                'from': str(r.start),
+                'to': str(r.end),
+                'kind': kind,
+                'detail': detail,
+            })
+
+        o = {
+            'initial': str(t.initial_node),
+            'forward': t.forward,
+            'max_depth': t.options.max_depth,
+            'clusters': [
+                {
+                    'id': sg.id,
+                    'label': sg.label,
+                    'parent': parents.get(sg.label),
+                }
+                for sg in sorted(subgraphs.values(), key=lambda x: x.id)
+            ],
+            'nodes': nodes,
+            'sinks': sorted(t.sinks),
+            'edges': edges,
+        }
+        return json.dumps(o, indent=2, sort_keys=True) + '\n'
+
+    # --------------------------------------------------------------------------
+    # Writing
+
+    def write(self, outfile, fmt='dot'):
+        text = self.json() if fmt == 'json' else self.dot()
+        with io.open(outfile, 'w') as f:
+            f.write(text)
@@ -0,0 +1,211 @@
+import ast
+import hashlib
+import io
+import os
+import os.path
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# -----------------------------------------------------------------------------
+# Extract - find the module keys that a source file imports
+
+ImportResult = namedtuple('ImportResult', ['imports', 'error', 'digest'])
+
+# Keep each worker busy with at least this much source per round trip
+MIN_CHUNK_BYTES = 256 * 1024
+CHUNKS_PER_JOB = 4
+
+EXTRACTORS = ('ast', 'fast')
+SCOPES = ('all', 'prologue')
+
+# Strings and comments can hide anything that looks like an import.  The
+# lookahead lets the regex engine skip quickly to where a match could start.
+SCANNER = re.compile(
+    r"(?=['\"#@ifdca])(?:"
+    r"(?P<string>'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"
+    r'|"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    r")"
+    r"|(?P<comment>#[^\n]*)"
+    r"|(?P<quote>['\"])"
+    r"|(?P<definition>^(?:async[ \t]+def|def|class)\b|^@)"
+    r"|(?P<keyword>\b(?:import|from)\b))",
+    re.MULTILINE | re.DOTALL
+)
+FROM_STATEMENT = re.compile(r'from\b((?:[ \t.\w]|\\\n)*?)\bimport\b')
+IMPORT_NAME = re.compile(r'\s*([^\W\d][\w.]*)(?:\s+as\s+[^\W\d]\w*)?\s*')
+DOTTED_NAME = re.compile(r'\.*(?:[^\W\d]\w*(?:\.[^\W\d]\w*)*)?')
+CONTINUATION = re.compile(r'\s|\\\n')
+
+
+class Unscannable(Exception):
+    ''' the fast extractor cannot be sure of this source '''
+    pass
+
+
+def digest_source(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def read_source(path):
+    with io.open(path, 'r', errors='ignore') as file_handle:
+        return file_handle.read()
+
+
+def extract_imports(content, scope='all'):
+    ''' the module keys imported by the source, in `ast.walk` order '''
+    parsed = ast.parse(content)
+
+    roots = [parsed]
+    if scope == 'prologue':
+        roots = []
+        for stmt in parsed.body:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                 ast.ClassDef)):
+                break
+            roots.append(stmt)
+
+    imports = []
+    for root in roots:
+        for ast_node in ast.walk(root):
+            if isinstance(ast_node, ast.Import):
+                for name in ast_node.names:
+                    imports.append(name.name)
+            elif isinstance(ast_node, ast.ImportFrom) and ast_node.module:
+                imports.append(ast_node.module)
+
+    return imports
+
+
+def scan_imports(content, scope='all'):
+    ''' the module keys imported by the source, in source order
+
+    Only the import statements themselves are looked at, so unlike
+    `extract_imports` this does not notice syntax errors elsewhere.
+    Raises Unscannable when an import is somewhere only the parser can
+    be trusted with, such as after a `;` or on the same line as a `:`
+    '''
+    if 'import' not in content:
+        return []
+
+    imports = []
+    skip_to = 0
+    for m in SCANNER.finditer(content):
+        kind = m.lastgroup
+        if kind == 'string' or kind == 'comment':
+            continue
+        if kind == 'quote':
+            raise Unscannable('unterminated string')
+        if kind == 'definition':
+            if scope == 'prologue':
+                break
+            continue
+
+        start = m.start()
+        if start < skip_to:
+            continue
+
+        line_start = content.rfind('\n', 0, start) + 1
+        prefix = content[line_start:start]
+        at_line_start = not prefix.strip()
+
+        if m.group() == 'from':
+            if not at_line_start:
+                # `yield from` and `raise ... from` are fine
+                if prefix.rstrip().endswith((':', ';')):
+                    raise Unscannable('compound statement')
+                continue
+
+            stmt = FROM_STATEMENT.match(content, start)
+            if stmt is None:
+                raise Unscannable('from without import')
+            module = CONTINUATION.sub('', stmt.group(1))
+            if not DOTTED_NAME.fullmatch(module):
+                raise Unscannable('module name')
+            module = module.lstrip('.')
+            if module:
+                imports.append(module)
+            skip_to = stmt.end()
+
+        else:
+            if not at_line_start:
+                raise Unscannable('compound statement')
+
+            end = content.find('\n', start)
+            while end > 0 and content[end - 1] == '\\':
+                end = content.find('\n', end + 1)
+            if end < 0:
+                end = len(content)
+
+            names = content[m.end():end].split('#', 1)[0]
+            names = names.replace('\\\n', ' ')
+            if ';' in names:
+                raise Unscannable('compound statement')
+            for name in names.split(','):
+                alias = IMPORT_NAME.fullmatch(name)
+                if alias is None:
+                    raise Unscannable('import name')
+                imports.append(alias.group(1))
+            skip_to = end
+
+    return imports
+
+
+def extract_file(path, extractor='ast', scope='all'):
+    content = read_source(path)
+    digest = digest_source(content)
+    try:
+        if extractor == 'fast':
+            try:
+                return ImportResult(scan_imports(content, scope), None, digest)
+            except Unscannable:
+                pass
+        return ImportResult(extract_imports(content, scope), None, digest)
+    except SyntaxError as se:
+        return ImportResult([], str(se), digest)
+
+
+def extract_chunk(paths, extractor='ast', scope='all'):
+    return [extract_file(p, extractor, scope) for p in paths]
+
+
+def chunk_paths(paths, jobs):
+    ''' split the paths, in order, into runs of roughly equal size '''
+    sizes = [os.path.getsize(p) for p in paths]
+    target = max(sum(sizes) // (jobs * CHUNKS_PER_JOB), MIN_CHUNK_BYTES)
+
+    chunks = []
+    chunk = []
+    total = 0
+    for path, size in zip(paths, sizes):
+        chunk.append(path)
+        total += size
+        if total >= target:
+            chunks.append(chunk)
+            chunk = []
+            total = 0
+    if chunk:
+        chunks.append(chunk)
+
+    return chunks
+
+
+def extract_files(paths, jobs=1, extractor='ast', scope='all'):
+    ''' the ImportResult of each path, in the same order as the paths '''
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1 or len(paths) < 2:
+        return extract_chunk(paths, extractor, scope)
+
+    chunks = chunk_paths(paths, jobs)
+    work = partial(extract_chunk, extractor=extractor, scope=scope)
+    results = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+        for chunk_results in pool.map(work, chunks):
+            results.extend(chunk_results)
+
+    return results
@@ -1,14 +1,69 @@
-import os.path
+import sys
+
+
+# Directories seen so far, so the files of one directory share their path,
+# its tuple of interned components and its dotted path
+_DIRS = {}
+
+
+def split_dir(path_to):
+    d = _DIRS.get(path_to)
+    if d is None:
+        parts = tuple(sys.intern(x) for x in path_to.split('/'))
+        d = _DIRS[path_to] = (path_to, parts, '.'.join(parts[2:]))
+    return d
+
+
+def common_prefix(a, b):
+    ''' how many leading components a and b share '''
+    if a is b:
+        return len(a)
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
 
 
 class File(object):
+    __slots__ = (
+        'full_path', 'ext', 'path_to', 'parts', '_basename',
+        'basename', 'gv_name', 'dotted_path', 'modulename',
+        'is_init', 'is_test'
+    )
+
     def __init__(self, full_path):
         self.full_path = full_path
-        self._basename, self.ext = os.path.splitext(
-            os.path.basename(full_path)
-        )
-        self.path_to = os.path.dirname(full_path)
-        self._paths = self.path_to.split('/')
+        head, _, name = full_path.rpartition('/')
+        if head and head.strip('/'):
+            head = head.rstrip('/')
+        elif full_path.startswith('/'):
+            head = '/' * (len(head) + 1)
+
+        # As os.path.splitext, which is too slow to call for every file
+        i = name.rfind('.')
+        if i > 0 and name[:i].strip('.'):
+            self._basename, ext = name[:i], name[i:]
+        else:
+            self._basename, ext = name, ''
+        self.ext = sys.intern(ext)
+
+        self.path_to, parts, self.dotted_path = split_dir(head)
+        self.parts = parts
+
+        # Everything else follows from the path, so work it out once
+        self.is_init = self._basename == '__init__'
+        self.is_test = 'test' in parts or self._basename.startswith('test_')
+
+        self.basename = parts[-1] if self.is_init else self._basename
+        # A name that is safe for graphviz output
+        self.gv_name = self.basename.replace('-', '_').replace('.', '_')
+        if not self.is_init:
+            self.modulename = '{}.{}'.format(parts[-1], self._basename)
+        elif len(parts) > 1:
+            self.modulename = '{}.{}'.format(parts[-2], parts[-1])
+        else:
+            self.modulename = parts[-1]
 
     def __lt__(self, other):
         return self.full_path < str(other)
@@ -34,71 +89,32 @@ class File(object):
     def __str__(self):
         return self.full_path
 
-    @property
-    def basename(self):
-        return self._paths[-1] if self.is_init else self._basename
-
-    @property
-    def gv_name(self):
-        '''A name that is safe for graphviz output'''
-        x = self.basename
-        return x.replace('-', '_').replace('.', '_')
-
-    @property
-    def dotted_path(self):
-        return '.'.join(self._paths[2:])
-
-    @property
-    def modulename(self):
-        if self.is_init:
-            return '{}.{}'.format(self._paths[-2], self._paths[-1])
-        return '{}.{}'.format(self._paths[-1], self._basename)
-
     @property
     def paths(self):
-        return self._paths.copy()
+        return list(self.parts)
 
     def distance(self, other):
-        a = self.paths
-        b = other.paths
-
-        while len(a) and len(b):
-            ax = a.pop(0)
-            bx = b.pop(0)
-            if ax != bx:
-                return len(a) + len(b) + 2  # ax + bx
-
-        return len(a) + len(b)
+        a = self.parts
+        b = other.parts
+        return len(a) + len(b) - 2 * common_prefix(a, b)
 
     def is_ancestor(self, other):
-        a = self.paths
-        b = other.paths
-
-        while len(a) and len(b):
-            ax = a.pop(0)
-            bx = b.pop(0)
-            if ax != bx:
-                break
+        a = self.parts
+        b = other.parts
+        i = common_prefix(a, b)
 
-        return len(a) == 0 and len(b) > 0
-
-    @property
-    def is_init(self):
-        return self._basename == '__init__'
+        # The first components that differ count as shared
+        if i < min(len(a), len(b)):
+            i += 1
+        return len(a) == i and len(b) > i
 
     @property
     def is_root(self):
-        return self._paths is None
+        return self.parts is None
 
     def is_sibling(self, other):
         return self.path_to == other.path_to
 
-    @property
-    def is_test(self):
-        return (
-            'test' in self._paths or self._basename.startswith('test_')
-        )
-
     def relative_label(self, other):
         rpath = self.relative_path(other)
         if not rpath:
@@ -110,19 +126,15 @@ class File(object):
         if self.is_sibling(other):
             return ''
 
-        a = self.paths
-        b = other.paths
-
-        while len(a) and len(b):
-            ax = a.pop(0)
-            bx = b.pop(0)
-            if ax != bx:
-                break
+        a = self.parts
+        b = other.parts
+        i = common_prefix(a, b)
 
-        s = bx
-        if len(b):
-            s = '{}.{}'.format(bx, '.'.join(b))
-        return s
+        # From where they part, or the last they share if one contains the
+        # other
+        if i == min(len(a), len(b)):
+            i -= 1
+        return '.'.join(b[i:])
 
 
 def jsonEncoderFile(o):
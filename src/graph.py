@@ -1,12 +1,20 @@
-import glob
 import io
+import itertools
 import json
 import os.path
 import sys
 from collections import namedtuple, OrderedDict
 
+from .cache import ImportCache
+from .compact import Adjacency, CompactGraph, CompactNodes
+from .extract import extract_files
 from .file import File, jsonEncoderFile
-from .pymods import PYMODS
+from .manifest import json_chunks, write_chunks_if_changed
+from .profiling import profiler
+from .pymods import Stdlib
+from .store import GraphStore, StoreGraph, StoreNodes
+from .walk import bfs, dfs
+from .why import shortest_paths
 
 # -----------------------------------------------------------------------------
 # Graph - contains the relation between files
@@ -15,14 +23,41 @@ ImportsGraphNode = namedtuple('ImportsGraphNode', [
     'node', 'imports', 'imported_by'
 ])
 
+GRAPH_BACKENDS = ('dict', 'csr', 'sqlite')
+
+# Files parsed and linked at a time when building into a GraphStore
+STORE_CHUNK = 10000
+
 
 class ImportsGraph(object):
-    def __init__(self, options, modules):
+    def __init__(self, options, modules, build=True):
         self.modules = modules
         self.nodes = OrderedDict()
         self.options = options
         self.externals = OrderedDict()
         self.unused = set()
+        self.stdlib = Stdlib(
+            options.treat_as_stdlib, not options.include_stdlib
+        )
+        self.cache = None
+        self.frozen = False
+
+        # ImportCosts from an importtime log, by node key
+        self.costs = {}
+        self.store = None
+        self._store_graph = None
+        self._compact = None
+        self._sources = None
+
+        # The module keys each file imports, and which files import each key;
+        # only an updatable (dict) graph keeps them once built
+        self._imported_keys = {}
+        self._key_users = None
+
+        # Ambiguous names, as resolved from each directory
+        self._resolved = {}
+        self.resolved_hits = 0
+        self.resolved_misses = 0
 
         if options.exclude_unused:
             if os.path.exists(options.exclude_unused):
@@ -31,7 +66,18 @@ class ImportsGraph(object):
                 print(options.exclude_unused,
                       'does not exist', file=sys.stderr)
 
-        self.build_import_graph()
+        # A snapshot fills in an empty graph itself
+        if not build:
+            return
+
+        if options.graph_backend == 'sqlite':
+            self.build_store()
+        else:
+            self.build_import_graph()
+
+        if options.graph_backend == 'csr':
+            with profiler.phase('freeze'):
+                self.freeze()
 
     def __contains__(self, key):
         k = str(key)
@@ -55,66 +101,149 @@ class ImportsGraph(object):
     @property
     def sources(self):
         ''' find all the nodes that are not imported '''
-        candidates = set()
-        for v in self.nodes.values():
-            if len(v.imported_by) == 0:
-                candidates.add(v.node)
+        if self._sources is not None:
+            return self._sources
+
+        if self.store is not None:
+            files = self._store_graph.nodes.files
+            candidates = [files[k] for k in self.store.unimported()]
+        else:
+            candidates = set()
+            for v in self.nodes.values():
+                if len(v.imported_by) == 0:
+                    candidates.add(v.node)
+
+        self._sources = [
+            str(x) for x in candidates if not x.is_init and not x.is_root
+        ]
+        return self._sources
+
+    # --------------------------------------------------------------------------
+    # Storage
+
+    def compact_graph(self):
+        ''' the graph interned to integer ids, rebuilt after any change '''
+        if self._compact is None and self.store is not None:
+            s = self.store
+            self._compact = CompactGraph.from_adjacency(
+                s.keys,
+                self.modules.files + s.keys[s.n_local:],
+                s.n_local,
+                Adjacency.from_arrays(*s.adjacency(True)),
+                Adjacency.from_arrays(*s.adjacency(False))
+            )
+        elif self._compact is None:
+            self._compact = CompactGraph(self)
+        return self._compact
+
+    def search_graph(self):
+        ''' what searches by id run on: the store a query at a time if the
+        graph is in one, so as not to read out every edge '''
+        if self._store_graph is not None:
+            return self._store_graph
+        return self.compact_graph()
+
+    def n_edges(self):
+        if self.store is not None:
+            return self.store.n_edges()
+        if self._compact is None:
+            return sum(len(v.imports) for v in self.nodes.values())
+        return len(self._compact.imports.targets)
+
+    def freeze(self):
+        ''' keep only the compact graph, dropping the per-node sets and what
+        linking them remembered '''
+        c = self.compact_graph()
+        self.nodes = CompactNodes(c, ImportsGraphNode, 0, c.n_local)
+        self.externals = CompactNodes(c, ImportsGraphNode, c.n_local, len(c))
+        self.frozen = True
+
+        # Nothing is linked again, so what linking remembers can go
+        self._imported_keys = None
+        self._resolved = {}
+        self.modules.forget()
+
+    def attach(self, store):
+        ''' answer from store from now on, holding no edges in memory '''
+        trie = self.modules.trie
+        store.add_modules(
+            (k, x.full_path) for x in self.modules.files
+            for k in trie.keys_of(x)
+        )
 
-        return [str(x) for x in candidates if not x.is_init and not x.is_root]
+        files = {x.full_path: x for x in self.modules.files}
+        self.store = store
+        self._store_graph = StoreGraph(store, files)
+        self.nodes = StoreNodes(store, ImportsGraphNode, files, True)
+        self.externals = StoreNodes(store, ImportsGraphNode, files, False)
+        self.frozen = True
+        self._compact = None
+        self._sources = None
 
     # --------------------------------------------------------------------------
     # Traversals
 
     def BFS(self, start, group, visited, forward=True):
-        queue = []
-        queue.append(start)
-        while queue != []:
-            node = queue.pop(0)
-            visited.add(node)
+        for node, _, _ in bfs(self, start, forward, visited=visited):
             group.add(node)
 
-            ign = self[node]
-            if ign:
-                edges = ign.imports if forward else ign.imported_by
-                for successor in edges:
-                    if successor not in visited and successor not in queue:
-                        queue.append(successor)
-
     def DFS(self, start, visited, order, forward=True):
-        visited.add(start)
-        ign = self[start]
-        if ign:
-            edges = ign.imports if forward else ign.imported_by
-            for successor in edges:
-                if successor not in visited:
-                    visited.add(successor)
-                    self.DFS(successor, visited, order, forward)
-        order.append(start)
+        for node, _, _ in dfs(
+            self, start, forward, visited=visited, postorder=True
+        ):
+            order.append(node)
+
+    def walk(self, start, forward=True, max_depth=None):
+        ''' stream (node, depth, parent) outward from start '''
+        return bfs(self, start, forward, max_depth)
+
+    def reachable(self, start, forward=True, max_depth=None):
+        ''' {key: depth} of everything within max_depth edges of start '''
+        if self.store is not None and max_depth is not None:
+            return self.store.reachable(str(start), max_depth, forward)
+        return {
+            str(x): d for x, d, _ in bfs(self, start, forward, max_depth)
+        }
 
     # --------------------------------------------------------------------------
     # Building
 
     def add_node(self, node):
         assert(isinstance(node, File))
+        assert(not self.frozen)
         self.nodes[node.full_path] = ImportsGraphNode(node, set(), set())
+        self._compact = None
+        self._sources = None
 
-    def add_edge(self, node, module_key):
-        assert(isinstance(node, File))
-        v = self[node.full_path]
-
+    def resolve_import(self, node, module_key):
+        ''' the File or external key node's import means, or None to skip '''
         # Skip Python modules
-        if module_key in PYMODS:
-            return
+        if module_key in self.stdlib:
+            return None
 
         # Skip unused
         if (node.full_path, module_key) in self.unused:
             # print('skipping', node.full_path, module_key)
-            return
+            return None
 
         # Is this module local?
         entry = self.modules[module_key]
         if entry:
-            other = self.resolve_entry(node, entry)
+            return self.resolve_entry(node, entry)
+        return module_key
+
+    def add_edge(self, node, module_key):
+        assert(isinstance(node, File))
+        assert(not self.frozen)
+        v = self[node.full_path]
+        self._compact = None
+        self._sources = None
+
+        other = self.resolve_import(node, module_key)
+        if other is None:
+            return
+
+        if isinstance(other, File):
             v.imports.add(other)
 
             if other not in self:
@@ -129,33 +258,210 @@ class ImportsGraph(object):
             self.externals[module_key].imported_by.add(node)
             v.imports.add(module_key)
 
-    def build_import_graph(self):
-        import ast
+    def extract(self, nodes):
+        ''' the ImportResult of each node, by path '''
+        cache = self.cache
+
+        # Parse whatever the cache cannot answer, possibly in parallel
+        results = {}
+        if cache is not None:
+            for node in nodes:
+                result = cache.lookup(node.full_path)
+                if result is not None:
+                    results[node.full_path] = result
+
+        misses = [x.full_path for x in nodes if x.full_path not in results]
+        profiler.count('files_cached', len(results))
+        profiler.count('files_parsed', len(misses))
+        for file, result in zip(misses, extract_files(
+            misses,
+            self.options.jobs,
+            self.options.extractor,
+            self.options.imports_scope
+        )):
+            results[file] = result
+            if cache is not None:
+                cache.store(file, result)
+
+        for node in nodes:
+            result = results[node.full_path]
+            if result.error:
+                print(node.full_path, result.error, file=sys.stderr)
+                profiler.count('syntax_errors')
+                self._imported_keys[node.full_path] = ()
+            else:
+                self._imported_keys[node.full_path] = result.imports
+
+        return results
 
-        for file in glob.glob(self.options.modules_path, recursive=True):
-            node = File(file)
-            if node.is_root:
-                continue
-            if node.is_test and not self.options.include_tests:
-                continue
+    def link(self, node):
+        for module_key in self._imported_keys[node.full_path]:
+            self.add_edge(node, module_key)
 
+    def unlink(self, node):
+        ''' drop the edges out of node, from both ends '''
+        v = self.nodes[node.full_path]
+        for x in v.imports:
+            other = self[x]
+            if other is not None:
+                other.imported_by.discard(node)
+        v.imports.clear()
+
+        self._compact = None
+        self._sources = None
+
+    def build_import_graph(self):
+        if self.options.cache_dir:
+            self.cache = ImportCache(self.options)
+
+        nodes = self.modules.files
+        with profiler.phase('extract'):
+            self.extract(nodes)
+            if self.cache is not None:
+                self.cache.save()
+
+        with profiler.phase('names'):
+            self.modules.trie
+
+        # Every file is a node before any edge can point at it
+        with profiler.phase('link'):
+            for node in nodes:
+                self.add_node(node)
+
+            # Link in discovery order so the graph does not depend on the
+            # workers
+            for node in nodes:
+                self.link(node)
+
+        if self.options.resolution_stats:
+            self.print_resolution_stats()
+
+    def build_store(self):
+        ''' build straight into a GraphStore, a chunk of files at a time
+
+        What a chunk imports is forgotten once it is linked, so only the
+        files, their names and the keys of the nodes stay in memory.
+        '''
+        if self.options.cache_dir:
+            self.cache = ImportCache(self.options)
+
+        store = GraphStore(self.options.graph_store)
+        nodes = self.modules.files
+        store.add_nodes([x.full_path for x in nodes], True)
+        with profiler.phase('names'):
+            self.modules.trie
+
+        for i in range(0, len(nodes), STORE_CHUNK):
+            chunk = nodes[i:i + STORE_CHUNK]
+            with profiler.phase('extract'):
+                self.extract(chunk)
+            with profiler.phase('link'):
+                for node in chunk:
+                    keys = self._imported_keys.pop(node.full_path)
+                    for module_key in keys:
+                        other = self.resolve_import(node, module_key)
+                        if other is not None:
+                            store.add_edge(node.full_path, str(other))
+        store.flush()
+        self._imported_keys = None
+        if self.cache is not None:
+            self.cache.save()
+        with profiler.phase('store'):
+            self.attach(store)
+
+        if self.options.resolution_stats:
+            self.print_resolution_stats()
+
+    def print_resolution_stats(self):
+        def rate(hits, total):
+            return 100.0 * hits / total if total else 0.0
+
+        m = self.modules
+        ambiguous = self.resolved_hits + self.resolved_misses
+        print('Resolution: {} names looked up, {:.1f}% cached; '
+              '{} ambiguous, {:.1f}% cached by directory'.format(
+                  m.lookups, rate(m.hits, m.lookups),
+                  ambiguous, rate(self.resolved_hits, ambiguous)),
+              file=sys.stderr)
+
+    # --------------------------------------------------------------------------
+    # Updating
+
+    def key_users(self):
+        ''' which files import each module key '''
+        if self._key_users is None:
+            self._key_users = {}
+            for path, keys in self._imported_keys.items():
+                for k in keys:
+                    self._key_users.setdefault(k, set()).add(path)
+        return self._key_users
+
+    def update(self, added=(), modified=(), removed=()):
+        ''' apply files that appeared, changed or went away
+
+        Only the changed files are parsed again.  Files that import a name
+        an added or removed file answers to are relinked, since what that
+        name resolves to may have changed.  Returns the keys of every node
+        an edge came or went at.
+        '''
+        assert(not self.frozen)
+        users = self.key_users()
+
+        # Names whose resolution may change
+        keys = set()
+        for node in list(added) + list(removed):
+            keys.update(self.modules.module_keys(node))
+        if keys:
+            self._resolved.clear()
+
+        relink = set(modified).union(added)
+        for k in keys:
+            relink.update(self.nodes[p].node for p in users.get(k, ()))
+        relink.difference_update(removed)
+        touched = set(x.full_path for x in list(relink) + list(removed))
+
+        # Take out the old edges, from both ends
+        for node in list(relink) + list(removed):
+            if node.full_path in self.nodes:
+                touched.update(
+                    str(x) for x in self.nodes[node.full_path].imports
+                )
+                self.unlink(node)
+        for node in removed:
+            for k in self._imported_keys.pop(node.full_path, ()):
+                users[k].discard(node.full_path)
+            self.modules.remove_file(node)
+            del self.nodes[node.full_path]
+
+        for node in added:
+            self.modules.add_file(node)
             self.add_node(node)
 
-            with io.open(file, 'r', errors='ignore') as file_handle:
-                content = file_handle.read()
-            try:
-                parsed = ast.parse(content)
-            except SyntaxError as se:
-                print(file, se, file=sys.stderr)
-                continue
-
-            for ast_node in ast.walk(parsed):
-                if isinstance(ast_node, ast.Import):
-                    for name in ast_node.names:
-                        self.add_edge(node, name.name)
-                elif isinstance(ast_node, ast.ImportFrom) and ast_node.module:
-                    # assert ast_node.module
-                    self.add_edge(node, ast_node.module)
+        # Parse again what changed, keeping the key users current
+        changed = list(modified) + list(added)
+        for node in changed:
+            for k in self._imported_keys.pop(node.full_path, ()):
+                users[k].discard(node.full_path)
+        self.extract(changed)
+        if self.cache is not None:
+            self.cache.save()
+        for node in changed:
+            for k in self._imported_keys[node.full_path]:
+                users.setdefault(k, set()).add(node.full_path)
+
+        for node in relink:
+            self.link(node)
+            touched.update(
+                str(x) for x in self.nodes[node.full_path].imports
+            )
+
+        # Externals nothing imports any more
+        for k in [k for k, v in self.externals.items() if not v.imported_by]:
+            del self.externals[k]
+
+        self._compact = None
+        self._sources = None
+        return touched
 
     def parse_unused(self):
         unused = set()
@@ -181,6 +487,20 @@ class ImportsGraph(object):
         if len(entry['aka']) == 0:
             return entry['node']
 
+        # The choice only depends on where the importer is, so make it once
+        # per directory, unless the working is wanted
+        key = (node.path_to, entry['key'])
+        if not self.options.warn_on_ambiguous_edge:
+            if key in self._resolved:
+                self.resolved_hits += 1
+                return self._resolved[key]
+            self.resolved_misses += 1
+
+        min_node = self.closest(node, entry)
+        self._resolved[key] = min_node
+        return min_node
+
+    def closest(self, node, entry):
         if self.options.warn_on_ambiguous_edge:
             print(node, 'has ambiguous edge', entry['key'])
 
@@ -205,16 +525,36 @@ class ImportsGraph(object):
     # --------------------------------------------------------------------------
     # Queries
 
+    def lookup(self, name):
+        ''' the node a path, module name or external is known by, or None '''
+        if name in self:
+            return self[name].node
+
+        entry = self.modules[name]
+        if entry and entry['node'] in self:
+            return self[entry['node']].node
+
+        return None
+
     def connected(self, candidates, forward=True):
         visited = set()
         groups = {}
         for node in sorted(candidates):
             if node not in visited:
-                group = set()
-                self.BFS(node, group, visited, forward)
-                groups[node] = group
+                groups[node] = set(
+                    x for x, _, _ in bfs(self, node, forward, visited=visited)
+                )
         return groups
 
+    def why(self, start, end, k=1):
+        ''' up to k of the shortest chains of imports from start to end '''
+        c = self.search_graph()
+        i = c.id_of(start)
+        j = c.id_of(end)
+        if i is None or j is None:
+            return []
+        return [[c.nodes[x] for x in p] for p in shortest_paths(c, i, j, k)]
+
     def find_all_paths(self, start, ends, path=[], depth=0):
         path = path + [start]
         if start in ends:
@@ -268,22 +608,25 @@ class ImportsGraph(object):
     # --------------------------------------------------------------------------
     # Output
 
-    def _to_json(self, ign_dict):
-        o = []
+    def _entries(self, ign_dict):
         for k in sorted(ign_dict):
             _, imports, imported_by = ign_dict[k]
-            o.append({
+            yield {
                 'file': k,
                 'imports': sorted(list(imports)),
                 'imported_by': sorted(list(imported_by))
-            })
-        return o
+            }
+
+    def _to_json(self, ign_dict):
+        return list(self._entries(ign_dict))
 
     def dump(self, outfile):
-        with io.open(outfile, 'w') as f:
-            print(self, file=f)
+        write_chunks_if_changed(outfile, itertools.chain(
+            json_chunks(self._entries(self.nodes), default=jsonEncoderFile),
+            ['\n']
+        ))
 
     def dump_externals(self, outfile):
-        o = self._to_json(self.externals)
-        with io.open(outfile, 'w') as f:
-            json.dump(o, f, indent=2, sort_keys=True, default=jsonEncoderFile)
+        write_chunks_if_changed(outfile, json_chunks(
+            self._entries(self.externals), default=jsonEncoderFile
+        ))
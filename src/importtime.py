@@ -0,0 +1,107 @@
+import io
+import math
+import re
+from collections import namedtuple
+
+# -----------------------------------------------------------------------------
+# Importtime - what each module costs to import, from `python -X importtime`
+#
+# Each line of the log is
+#
+#     import time:       333 |        893 | _frozen_importlib_external
+#
+# the microseconds spent in the module itself and with everything it
+# imported, then the module name, indented by how deep it was imported.
+# The log is read a line at a time, so its size does not matter; a module
+# logged more than once (several runs in one log) keeps its dearest entry.
+
+ImportCost = namedtuple('ImportCost', ['self_us', 'cumulative_us'])
+
+MARKER = 'import time:'
+LINE = re.compile(r'import time:\s*(\d+)\s*\|\s*(\d+)\s*\|\s*(\S+)')
+
+# How many shades of red costs are drawn in, as in graphviz's reds9
+HEAT_LEVELS = 9
+
+
+def parse_importtime(lines):
+    ''' {module name: ImportCost} '''
+    costs = {}
+    for line in lines:
+        i = line.find(MARKER)
+        if i < 0:
+            continue
+        m = LINE.match(line, i)
+        if m is None:
+            # The header, or a line cut short
+            continue
+
+        cost = ImportCost(int(m.group(1)), int(m.group(2)))
+        name = m.group(3)
+        old = costs.get(name)
+        if old is None or cost.cumulative_us > old.cumulative_us:
+            costs[name] = cost
+    return costs
+
+
+def read_importtime(path, graph):
+    ''' the costs in the log at path, by the key of the node they are for '''
+    with io.open(path, 'r', errors='replace') as f:
+        costs = parse_importtime(f)
+
+    mapped = {}
+    for name, cost in costs.items():
+        if name in graph.stdlib:
+            continue
+        node = graph.lookup(name)
+        if node is None:
+            continue
+        key = str(node)
+        old = mapped.get(key)
+        if old is None or cost.cumulative_us > old.cumulative_us:
+            mapped[key] = cost
+    return mapped
+
+
+def heat(cost, hottest):
+    ''' 1 for the cheapest to HEAT_LEVELS for the dearest, on a log scale '''
+    if hottest <= 0:
+        return 1
+    level = math.ceil(
+        HEAT_LEVELS * math.log1p(cost.cumulative_us) / math.log1p(hottest)
+    )
+    return min(max(level, 1), HEAT_LEVELS)
+
+
+def cost_label(cost):
+    return '{:.1f} ms, {:.1f} self'.format(
+        cost.cumulative_us / 1000.0, cost.self_us / 1000.0
+    )
+
+
+def expensive_chains(relations, start, costs, n):
+    ''' the relations on the n dearest chains of imports from start
+
+    A chain leaves start by one of its n dearest imports, then keeps taking
+    the dearest import it has not been through, as a profiler's hot path
+    does, until it runs out of edges.
+    '''
+    successors = {}
+    for r in relations:
+        successors.setdefault(r.start, []).append(r)
+
+    def dearest(r):
+        cost = costs.get(str(r.end))
+        return (-(cost.cumulative_us if cost else 0), str(r.end))
+
+    kept = set()
+    for r in sorted(successors.get(start, ()), key=dearest)[:n]:
+        seen = set([start])
+        while r is not None:
+            kept.add(r)
+            seen.add(r.end)
+            following = [
+                x for x in successors.get(r.end, ()) if x.end not in seen
+            ]
+            r = min(following, key=dearest) if following else None
+    return kept
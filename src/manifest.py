@@ -0,0 +1,139 @@
+import filecmp
+import hashlib
+import io
+import json
+import os
+import os.path
+import sys
+import textwrap
+
+# -----------------------------------------------------------------------------
+# Manifest - what was written to an output directory, and from what
+#
+# Each output directory keeps a small JSON file mapping every .gv it holds to
+# a digest of the inputs it was rendered from.  A traversal whose digest
+# matches is not written again, so its mtime (and whatever is rendered from
+# it downstream) is left alone.  Files recorded by an earlier run and not
+# produced by this one are removed; nothing the manifest never recorded is
+# touched.
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+
+def digest_lines(lines):
+    h = hashlib.sha1()
+    for line in lines:
+        h.update(line.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def write_if_changed(outfile, text):
+    ''' write text to outfile unless it already holds exactly that '''
+    try:
+        with io.open(outfile, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+
+    with io.open(outfile, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+
+def json_chunks(items, pairs=False, default=None):
+    ''' what json.dumps(..., indent=2, sort_keys=True) writes of a list of
+    items, or of a dict given as (key, value) pairs in key order, an item
+    at a time '''
+    opening, closing = '{}' if pairs else '[]'
+    sep = opening + '\n'
+    for item in items:
+        if pairs:
+            key, item = item
+        text = textwrap.indent(
+            json.dumps(item, indent=2, sort_keys=True, default=default), '  '
+        )
+        if pairs:
+            text = '  {}: {}'.format(json.dumps(key), text[2:])
+        yield sep + text
+        sep = ',\n'
+
+    if sep == ',\n':
+        yield '\n' + closing
+    else:
+        yield opening + closing
+
+
+def write_chunks_if_changed(outfile, chunks):
+    ''' as write_if_changed, for text too big to hold all at once '''
+    tmp = outfile + '.tmp'
+    with io.open(tmp, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+    if os.path.exists(outfile) and filecmp.cmp(tmp, outfile, shallow=False):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, outfile)
+    return True
+
+
+class Manifest(object):
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.previous = {}
+        self.current = {}
+        self.load()
+
+    def load(self):
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print('Ignoring unreadable manifest {}: {}'.format(self.path, e),
+                  file=sys.stderr)
+            return
+
+        if data.get('version') == MANIFEST_VERSION:
+            self.previous = data.get('files', {})
+
+    def fresh(self, name, digest):
+        ''' is name already on disk as rendered from digest? '''
+        if name in self.current:
+            # Written earlier in this run, by something else with the name
+            return self.current[name] == digest
+        return (
+            self.previous.get(name) == digest and
+            os.path.exists(os.path.join(self.directory, name))
+        )
+
+    def record(self, name, digest):
+        self.current[name] = digest
+
+    def keep(self, name):
+        ''' carry name over from the last run, as it was not drawn again '''
+        if name in self.previous:
+            self.current[name] = self.previous[name]
+
+    def prune(self):
+        ''' remove what an earlier run wrote and this one did not '''
+        removed = []
+        for name in sorted(set(self.previous).difference(self.current)):
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed.append(name)
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def save(self):
+        o = {'version': MANIFEST_VERSION, 'files': self.current}
+        write_if_changed(
+            self.path, json.dumps(o, indent=2, sort_keys=True) + '\n'
+        )
+        self.previous, self.current = self.current, {}
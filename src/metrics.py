@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import os.path
+from collections import deque
+
+from .manifest import write_if_changed
+
+# -----------------------------------------------------------------------------
+# Metrics - how much each module depends on, and how much depends on it
+#
+# What a module transitively imports comes from the closure bitsets of the
+# ReachabilityIndex, one per component of the condensed graph, unioned once
+# in reverse topological order; counting the local and external bits of a
+# module's component is then one popcount each, instead of a BFS per module.
+
+COLUMNS = [
+    'module', 'fan_in', 'fan_out', 'depth', 'cycle_size',
+    'imports_modules', 'imports_externals', 'imported_by_modules',
+]
+
+
+class ModuleMetrics(object):
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    def depths(self):
+        ''' per id, the fewest imports from a source, or -1 '''
+        c = self.index.compact
+        depth = [-1] * len(c)
+        queue = deque()
+        for k in self.graph.sources:
+            i = c.id_of(k)
+            if i is not None:
+                depth[i] = 0
+                queue.append(i)
+
+        while queue:
+            u = queue.popleft()
+            for v in c.imports[u]:
+                if depth[v] == -1:
+                    depth[v] = depth[u] + 1
+                    queue.append(v)
+        return depth
+
+    def rows(self):
+        ''' a dict per local module, those dragging in the most first '''
+        index = self.index
+        c = index.compact
+        local = (1 << c.n_local) - 1
+        forward = index.closure(True)
+        backward = index.closure(False)
+        depth = self.depths()
+
+        rows = []
+        for i in range(c.n_local):
+            component = index.component[i]
+            reach = forward[component]
+            rows.append({
+                'module': c.keys[i],
+                'fan_in': c.imported_by.degree(i),
+                'fan_out': c.imports.degree(i),
+                'depth': depth[i],
+                'cycle_size': len(index.components[component]),
+                # Not counting the module itself
+                'imports_modules': (reach & local).bit_count() - 1,
+                'imports_externals': (reach >> c.n_local).bit_count(),
+                'imported_by_modules':
+                    (backward[component] & local).bit_count() - 1,
+            })
+
+        rows.sort(key=lambda r: (
+            -r['imports_modules'], -r['imports_externals'], r['module']
+        ))
+        return rows
+
+    def csv(self):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(self.rows())
+        return out.getvalue()
+
+    def json(self):
+        return json.dumps(self.rows(), indent=2, sort_keys=True) + '\n'
+
+    def dump(self, outfile):
+        ''' as JSON for a .json file, otherwise as CSV '''
+        if os.path.splitext(outfile)[1].lower() == '.json':
+            write_if_changed(outfile, self.json())
+        else:
+            write_if_changed(outfile, self.csv())
@@ -1,72 +1,113 @@
-import glob
-import io
+import itertools
 import json
 
-from .file import File, jsonEncoderFile
+from .discovery import discover
+from .file import jsonEncoderFile
+from .manifest import json_chunks, write_chunks_if_changed
+from .trie import ModuleTrie
 
 
 # -----------------------------------------------------------------------------
 # Modules - a dictionary of names that a particular file may appear as
+#
+# The names live in a ModuleTrie, built when first needed; an entry is only
+# made for a name when it is first asked for, and kept for the next time.
 
 class Modules(object):
-    def __init__(self, options):
+    def __init__(self, options, files=None):
         self._cache = {}
-        self._nodes = set()
         self.options = options
+        self.files = discover(options) if files is None else files
+        self._trie = None
 
-        self.build_module_list()
+        # How often a key was asked for, and answered from the cache
+        self.lookups = 0
+        self.hits = 0
 
     def __getitem__(self, key):
-        entry = self._cache.get(key, None)
-        if entry is None:
-            return None
+        self.lookups += 1
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        entry = None
+        candidates = self.trie.candidates(key)
+        if candidates:
+            entry = {
+                'key': key,
+                'node': candidates[0],
+                'aka': candidates[1:]
+            }
 
+        self._cache[key] = entry
         return entry
 
     def __iter__(self):
-        return iter(self._nodes)
+        return iter(self.files)
 
     def __repr__(self):
+        o = dict((k, self.trie_entry(k)) for k in self.trie.keys())
         return json.dumps(
-            self._cache, indent=2, sort_keys=True, default=jsonEncoderFile
+            o, indent=2, sort_keys=True, default=jsonEncoderFile
         )
 
-    def add_module(self, key, node):
-        self._nodes.add(node)
+    def trie_entry(self, key):
+        ''' the entry for key, without counting or caching it '''
         if key in self._cache:
-            if self.options.warn_on_duplicate_module:
-                print(key, 'already added!')
-                print('\tin \t', self._cache[key]['node'])
-                print('\tout\t', node)
-                print('\taka\t', self._cache[key]['aka'])
-            self._cache[key]['aka'].append(node)
-        else:
-            self._cache[key] = {
-                'key': key,
-                'node': node,
-                'aka': []
-            }
+            return self._cache[key]
+        candidates = self.trie.candidates(key)
+        return {'key': key, 'node': candidates[0], 'aka': candidates[1:]}
+
+    def add_module(self, node):
+        if self.options.warn_on_duplicate_module:
+            for key in self.module_keys(node):
+                candidates = self.trie.candidates(key)
+                if candidates:
+                    print(key, 'already added!')
+                    print('\tin \t', candidates[0])
+                    print('\tout\t', node)
+                    print('\taka\t', candidates[1:])
+        self.trie.add(node)
+
+    def module_keys(self, node):
+        ''' every name node may be imported as '''
+        return self.trie.keys_of(node)
+
+    @property
+    def trie(self):
+        ''' the names, indexed when first needed '''
+        if self._trie is None:
+            self._trie = ModuleTrie(self.options.source_roots)
+            self.build_module_list()
+        return self._trie
 
     def build_module_list(self):
-        for file in glob.glob(self.options.modules_path, recursive=True):
-            node = File(file)
-            if node.is_root:
-                continue
-            if node.is_test and not self.options.include_tests:
-                continue
-
-            key = node.basename
-            self.add_module(key, node)
-
-            if not node.is_init:
-                paths = node.paths
-                up = paths.pop(-1)
-                # TODO: Use self.options.modules_path
-                while up and up != '.' and up != 'dcm-intuition':
-                    key = '{}.{}'.format(up, key)
-                    self.add_module(key, node)
-                    up = paths.pop(-1)
+        for node in self.files:
+            self.add_module(node)
+
+    # --------------------------------------------------------------------------
+    # Updating
+
+    def add_file(self, node):
+        self.files.append(node)
+        if self._trie is not None:
+            self.add_module(node)
+        self._cache.clear()
+
+    def remove_file(self, node):
+        self.files.remove(node)
+        if self._trie is not None:
+            self._trie.remove(node)
+        self._cache.clear()
+
+    def forget(self):
+        ''' drop the names looked up so far, once nothing will link again '''
+        self._cache = {}
 
     def dump(self, outfile):
-        with io.open(outfile, 'w') as f:
-            print(self, file=f)
+        entries = (
+            (k, self.trie_entry(k)) for k in sorted(self.trie.keys())
+        )
+        write_chunks_if_changed(outfile, itertools.chain(
+            json_chunks(entries, True, jsonEncoderFile), ['\n']
+        ))
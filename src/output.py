@@ -0,0 +1,269 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import os.path
+import sys
+
+from .cycles import CycleReport
+from .manifest import Manifest
+from .metrics import ModuleMetrics
+from .profiling import profiler
+from .traversal import Traversal, traversal_targets
+from .why import why_dot, why_text
+
+# -----------------------------------------------------------------------------
+# Output - write the traversal of each start and each end
+#
+# Every traversal is independent, so with --jobs they are spread over worker
+# processes forked after the graph is built; the workers share the graph
+# copy-on-write, write their own .gv files and send back what they would
+# have printed, which the parent prints in the original order.  Only the
+# parent updates the manifests; the workers just consult them.
+
+# The run being written, as inherited by the forked workers
+_shared = None
+
+
+def output_dumps(cfg, modules, graph):
+    if cfg.output_modules:
+        modules.dump(cfg.output_modules)
+
+    if cfg.output_imports_graph:
+        graph.dump(cfg.output_imports_graph)
+
+    if cfg.output_externals:
+        graph.dump_externals(cfg.output_externals)
+
+
+def output_cycles(cfg, index):
+    report = CycleReport(index)
+    if cfg.output_cycles:
+        report.dump(cfg.output_cycles)
+    if cfg.output_cycles_dot:
+        report.dump_dot(cfg.output_cycles_dot)
+
+    largest = len(report.cycles[0][0]) if report.cycles else 0
+    print('Cycles: {} ({} modules in the largest)'.format(
+        len(report), largest))
+
+
+def output_metrics(cfg, graph, index):
+    ModuleMetrics(graph, index).dump(cfg.output_metrics)
+
+
+def output_file(cfg, graph, forward, key):
+    ''' the .gv the traversal of key goes in, or None for a missing start '''
+    if forward:
+        if key not in graph:
+            return None
+        return os.path.join(
+            cfg.output_dot_starts, graph[key].node.basename + '.gv'
+        )
+    return os.path.join(cfg.output_dot_ends, key.replace('.', '_') + '.gv')
+
+
+def output_names(cfg, outfile):
+    ''' the names of the .gv (and .json) written for outfile '''
+    names = [os.path.basename(outfile)]
+    if cfg.output_json:
+        names.append(os.path.splitext(names[0])[0] + '.json')
+    return names
+
+
+def output_written(traversal, manifest, outfile):
+    ''' write the .gv (and .json) unless the manifest has them up to date
+
+    Returns the (name, digest) of each file
+    '''
+    outfiles = [(outfile, traversal.output_dot)]
+    if traversal.options.output_json:
+        outfiles.append((
+            os.path.splitext(outfile)[0] + '.json', traversal.output_json
+        ))
+
+    digest = traversal.digest()
+    written = []
+    unchanged = True
+    for path, output in outfiles:
+        name = os.path.basename(path)
+        if not manifest.fresh(name, digest):
+            with profiler.phase('render'):
+                output(path)
+            unchanged = False
+        written.append((name, digest))
+    profiler.count(
+        'traversals_unchanged' if unchanged else 'traversals_written'
+    )
+
+    print('{} nodes {} edges{}'.format(
+        len(traversal.subgraphs.all_nodes),
+        len(traversal.relations),
+        ' (unchanged)' if unchanged else ''
+    ))
+    return written
+
+
+def output_start(cfg, graph, index, manifest, i, s):
+    if s not in graph:
+        print('Output start [{}] {}...not found. Skipping'.format(i, s))
+        return
+
+    traversal = Traversal(cfg, graph, s, True, index)
+    print('Output start [{}] {}...'.format(
+        i, traversal.initial_node.modulename), end='')
+    if len(traversal.relations):
+        outfile = output_file(cfg, graph, True, s)
+        return output_written(traversal, manifest, outfile)
+    else:
+        print('no edges found. Skipping')
+
+
+def output_end(cfg, graph, index, manifest, i, k):
+    print('Output end [{}] {}...'.format(i, k), end='')
+    traversal = Traversal(cfg, graph, k, False, index)
+    if len(traversal.relations):
+        outfile = output_file(cfg, graph, False, k)
+        return output_written(traversal, manifest, outfile)
+    else:
+        print('no edges found. Skipping')
+
+
+def output_item(item):
+    ''' returns (directory, [(name, digest), ...]) for what was output '''
+    forward, i, key = item
+    cfg, graph, index, manifests = _shared
+    if forward:
+        directory = cfg.output_dot_starts
+        output = output_start
+    else:
+        directory = cfg.output_dot_ends
+        output = output_end
+    traversal = {'forward': forward, 'index': i, 'key': key}
+    with profiler.phase('traversal', traversal):
+        written = output(cfg, graph, index, manifests[directory], i, key)
+    if written is not None:
+        return directory, written
+
+
+def output_captured(item):
+    ''' run in a worker, returning what would have been printed, and what
+    the profiler recorded '''
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        written = output_item(item)
+    return out.getvalue(), written, profiler.take()
+
+
+def output_manifests(cfg):
+    ''' one Manifest per output directory, even when starts and ends share '''
+    manifests = {}
+    by_path = {}
+    for directory in (cfg.output_dot_starts, cfg.output_dot_ends):
+        if not directory:
+            continue
+        path = os.path.realpath(directory)
+        if path not in by_path:
+            by_path[path] = Manifest(directory)
+        manifests[directory] = by_path[path]
+    return manifests
+
+
+def output_traversals(cfg, graph, index, only=None):
+    ''' write every traversal, or only the (forward, key) ones in only,
+    keeping the rest as they are '''
+    global _shared
+
+    items = []
+    if cfg.output_dot_starts:
+        os.makedirs(cfg.output_dot_starts, exist_ok=True)
+        items += [(True, i, s) for i, s in enumerate(cfg.starts, 1)]
+    if cfg.output_dot_ends:
+        os.makedirs(cfg.output_dot_ends, exist_ok=True)
+        items += [(False, i, k) for i, k in enumerate(cfg.ends, 1)]
+
+    kept = []
+    if only is not None:
+        kept = [x for x in items if (x[0], x[2]) not in only]
+        items = [x for x in items if (x[0], x[2]) in only]
+
+    jobs = cfg.jobs if cfg.jobs > 0 else os.cpu_count() or 1
+    jobs = min(jobs, len(items))
+    if jobs > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        print('--jobs needs fork, writing traversals serially',
+              file=sys.stderr)
+        jobs = 1
+    if jobs > 1 and graph.store is not None:
+        print('--graph-backend sqlite cannot be shared with forked workers, '
+              'writing traversals serially', file=sys.stderr)
+        jobs = 1
+
+    manifests = output_manifests(cfg)
+    for forward, _, key in kept:
+        outfile = output_file(cfg, graph, forward, key)
+        if outfile is None:
+            continue
+        directory = cfg.output_dot_starts if forward else cfg.output_dot_ends
+        for name in output_names(cfg, outfile):
+            manifests[directory].keep(name)
+
+    def record(written):
+        if written is not None:
+            directory, files = written
+            for name, digest in files:
+                manifests[directory].record(name, digest)
+
+    _shared = (cfg, graph, index, manifests)
+    try:
+        if jobs <= 1:
+            for item in items:
+                record(output_item(item))
+        else:
+            output_parallel(cfg, graph, index, items, jobs, record)
+    finally:
+        _shared = None
+
+    for manifest in dict.fromkeys(manifests.values()):
+        for name in manifest.prune():
+            print('Removed stale {}'.format(
+                os.path.join(manifest.directory, name)))
+        manifest.save()
+
+
+def output_parallel(cfg, graph, index, items, jobs, record):
+    # Anything computed lazily should be computed once, before forking
+    for forward in (True, False):
+        index.distances(traversal_targets(cfg, graph, forward), forward)
+
+    # The workers start from a copy of the profiler; keep what it has so
+    # far out of that copy, so they only send back what they record
+    profiled = profiler.take()
+
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(jobs) as pool:
+        for text, written, taken in pool.imap(output_captured, items):
+            print(text, end='')
+            record(written)
+            profiler.merge(taken)
+    profiler.merge(profiled)
+
+
+def output_why(cfg, graph):
+    ''' print, or draw, the shortest chains from one module to another '''
+    start, end = cfg.why
+    a = graph.lookup(start)
+    b = graph.lookup(end)
+    for name, node in ((start, a), (end, b)):
+        if node is None:
+            print(name, 'not found!', file=sys.stderr)
+    if a is None or b is None:
+        return
+
+    paths = graph.why(a, b, cfg.why_paths)
+    if cfg.why_output:
+        with io.open(cfg.why_output, 'w') as f:
+            f.write(why_dot(a, b, paths))
+        print('Output why {} -> {}...{} paths'.format(
+            start, end, len(paths)))
+    else:
+        print(why_text(a, b, paths), end='')
@@ -0,0 +1,310 @@
+from collections import deque
+
+from .edge import Edge
+from .profiling import profiler
+
+# -----------------------------------------------------------------------------
+# Paths - the edges that lie on a bounded path, without enumerating the paths
+#
+# `ImportsGraph.find_all_paths` lists every simple path of at most
+# max_depth + 1 edges that reaches a target, which is exponential on dense
+# graphs, when all a Traversal keeps is the union of their edges.  Here an
+# edge u -> v is on such a path when
+#
+#     depth(u) + 1 + togo(v) <= max_depth + 1
+#
+# where depth is the BFS distance from the initial node and togo is the BFS
+# distance to the nearest target.  Joining those two shortest paths can
+# revisit a node when the graph has cycles, so each edge is confirmed with a
+# simple path: the shortest way on from v that avoids the shortest way to u,
+# or the shortest way to u that avoids the shortest way on from v.  When
+# neither will do, a node that every way to u and every way on from v must
+# pass through rules the edge out.  Only what is left is searched for, over
+# the simple paths to u, bounded by the same distances; that search is
+# exact, and exponential only in the worst case.  Every one of these looks
+# back from u, or on from v, only at the nodes whose depth or togo leaves
+# room to get there in time, so each costs about as much as the edges near
+# u and v, not the whole traversal.
+#
+# A ReachabilityIndex can supply togo for the whole graph up front, which
+# also keeps the BFS out of branches that cannot reach a target in time.
+#
+# Everything runs on the integer ids of the CompactGraph.
+
+
+class PathEdges(object):
+    def __init__(self, compact, initial, targets, max_depth, forward=True,
+                 togo=None):
+        self.compact = compact
+        self.initial = compact.id_of(initial)
+        self.targets = set(
+            i for i in map(compact.id_of, targets) if i is not None
+        )
+        self.limit = max_depth + 1
+        self.forward = forward
+
+        self.depth = {}
+        self.parent = {}
+        self.successors = {}
+        self.predecessors = None
+        self.togo = togo
+
+        # How far each node is from u, by u, for the searches
+        self.to = {}
+
+    def __iter__(self):
+        ''' the edges, as (importer, imported) Edges '''
+        if self.initial is None or self.initial in self.targets:
+            return
+
+        if self.togo is None:
+            self.togo = [-1] * len(self.compact)
+            self.label_depth(prune=False)
+            self.label_togo()
+        else:
+            self.label_depth(prune=True)
+
+        nodes = self.compact.nodes
+        for u, vs in self.successors.items():
+            for v in vs:
+                if not self.in_time(v, self.depth[u] + 1):
+                    continue
+                if self.confirm(u, v):
+                    if self.forward:
+                        yield Edge(nodes[u], nodes[v])
+                    else:
+                        yield Edge(nodes[v], nodes[u])
+
+    # --------------------------------------------------------------------------
+    # Labelling
+
+    def in_time(self, v, d):
+        ''' can v, found at depth d, still reach a target within the limit? '''
+        togo = self.togo[v]
+        return togo >= 0 and d + togo <= self.limit
+
+    def label_depth(self, prune):
+        ''' BFS from the initial node, not passing through any target '''
+        self.depth[self.initial] = 0
+        frontier = [self.initial]
+
+        for d in range(1, self.limit + 1):
+            following = []
+            for u in frontier:
+                vs = self.successors[u] = self.compact.successors(
+                    u, self.forward
+                )
+                for v in vs:
+                    if v in self.depth:
+                        continue
+                    self.depth[v] = d
+                    self.parent[v] = u
+                    if v in self.targets:
+                        continue
+                    if prune and not self.in_time(v, d):
+                        continue
+                    following.append(v)
+            frontier = following
+
+        self.predecessors = {}
+        for u, vs in self.successors.items():
+            for v in vs:
+                self.predecessors.setdefault(v, []).append(u)
+
+    def label_togo(self):
+        ''' BFS back from the targets that were reached '''
+        predecessors = self.predecessors
+        queue = deque()
+        for x in self.depth:
+            if x in self.targets:
+                self.togo[x] = 0
+                queue.append(x)
+
+        while queue:
+            v = queue.popleft()
+            for u in predecessors.get(v, ()):
+                if self.togo[u] == -1:
+                    self.togo[u] = self.togo[v] + 1
+                    queue.append(u)
+
+    # --------------------------------------------------------------------------
+    # Confirming
+
+    def path_to(self, u):
+        ''' the BFS tree path from the initial node to u '''
+        path = [u]
+        while u != self.initial:
+            u = self.parent[u]
+            path.append(u)
+        path.reverse()
+        return path
+
+    def path_from(self, v):
+        ''' a shortest path from v to a target '''
+        path = [v]
+        while self.togo[v]:
+            for w in self.successors[v]:
+                if self.togo[w] == self.togo[v] - 1:
+                    v = w
+                    break
+            path.append(v)
+        return path
+
+    def confirm(self, u, v):
+        ''' is there a simple path through u -> v within the limit? '''
+        head = self.path_to(u)
+        tail = self.path_from(v)
+        if not set(head).intersection(tail):
+            return True
+
+        # Go on from v some other way, or get to u some other way
+        if v not in head and self.finish(v, head):
+            return True
+        if u not in tail and self.start(u, tail):
+            return True
+
+        # A node that every short way to u and every short way on from v
+        # must pass through rules the edge out; it can only be one of these
+        for c in set(head).intersection(tail).union((u, v)):
+            if self.unavoidable(u, v, c):
+                return False
+
+        return self.search(u, v)
+
+    def unavoidable(self, u, v, c):
+        ''' is c on every way to u, and every way on from v, that fit? '''
+        if c != u and self.way_to(u, [c], self.limit - 1 - self.togo[v]):
+            return False
+        return c == v or self.way_on(
+            v, [c], self.limit - 1 - self.depth[u]
+        ) is None
+
+    def start(self, u, tail):
+        ''' can the initial node reach u without touching the tail? '''
+        return self.way_to(u, tail, self.limit - len(tail))
+
+    def way_to(self, u, avoid, remaining):
+        ''' can the initial node reach u in at most remaining edges, without
+        touching the nodes to avoid?
+
+        Searched back from u, so only the nodes whose depth leaves room to
+        get to u in time are looked at, not everything explored.
+        '''
+        avoid = set(avoid)
+        if self.initial in avoid:
+            return False
+        if u == self.initial:
+            return True
+
+        seen = {u}
+        frontier = [u]
+        for k in range(1, remaining + 1):
+            following = []
+            for w in frontier:
+                for x in self.predecessors.get(w, ()):
+                    if x == self.initial:
+                        return True
+                    if x in seen or x in avoid or \
+                            self.depth[x] + k > remaining:
+                        continue
+                    seen.add(x)
+                    following.append(x)
+            frontier = following
+
+        return False
+
+    def distances_to(self, u):
+        ''' how far each node is from u, to prune detours early; only the
+        nodes that could be on a way to u within the limit '''
+        to_u = self.to.get(u)
+        if to_u is not None:
+            return to_u
+
+        to_u = self.to[u] = {u: 0}
+        queue = deque([u])
+        while queue:
+            w = queue.popleft()
+            for x in self.predecessors.get(w, ()):
+                if x not in to_u and \
+                        self.depth[x] + to_u[w] + 1 < self.limit:
+                    to_u[x] = to_u[w] + 1
+                    queue.append(x)
+        return to_u
+
+    def search(self, u, v):
+        ''' try the simple paths to u that leave room to finish from v
+
+        Each partial path keeps a way on from v that avoids it, found again
+        only when the path steps onto it, and is dropped as soon as there
+        is none.
+        '''
+        profiler.count('edges_searched')
+        to_u = self.distances_to(u)
+        if self.initial not in to_u:
+            return False
+
+        def grown(head, tail, w):
+            ''' the way on from v once head ends in w, or None '''
+            remaining = self.limit - len(head) - to_u[w]
+            if w == v or remaining < self.togo[v]:
+                return None
+            if tail is not None and w not in tail and \
+                    len(tail) - 1 <= remaining:
+                return tail
+            return self.way_on(v, head, remaining)
+
+        head = [self.initial]
+        tail = grown(head, None, self.initial)
+        if tail is None or self.initial == u:
+            return tail is not None
+
+        stack = [(head, tail)]
+        while stack:
+            head, tail = stack.pop()
+            for w in self.successors.get(head[-1], ()):
+                if w in head or w not in to_u:
+                    continue
+                following = grown(head + [w], tail, w)
+                if following is None:
+                    continue
+                if w == u:
+                    return True
+                stack.append((head + [w], following))
+
+        return False
+
+    def way_on(self, v, head, remaining):
+        ''' a shortest way from v to a target in at most remaining edges,
+        not touching the head of the path, or None '''
+        avoid = set(head)
+        parent = {v: None}
+        frontier = [v]
+        for steps in range(remaining + 1):
+            following = []
+            for x in frontier:
+                if x in self.targets:
+                    tail = []
+                    while x is not None:
+                        tail.append(x)
+                        x = parent[x]
+                    tail.reverse()
+                    return tail
+                if steps == remaining:
+                    continue
+                for w in self.successors.get(x, ()):
+                    if w in parent or w in avoid or \
+                            not 0 <= self.togo[w] < remaining - steps:
+                        continue
+                    parent[w] = x
+                    following.append(w)
+            frontier = following
+
+        return None
+
+    def finish(self, v, head):
+        ''' can v reach a target without revisiting the head of the path? '''
+        return self.way_on(v, head, self.limit - len(head)) is not None
+
+
+def path_edges(compact, initial, targets, max_depth, forward=True, togo=None):
+    return set(PathEdges(compact, initial, targets, max_depth, forward, togo))
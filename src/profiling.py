@@ -0,0 +1,171 @@
+import cProfile
+import io
+import json
+import os.path
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# Profiling - where a run spends its time and memory
+#
+# Phases are named blocks of the run, timed and measured wherever they are
+# entered; a phase entered more than once (a chunk of files, a traversal)
+# adds up its calls and wall time and keeps its highest peak.  Memory is
+# what tracemalloc sees, so only Python allocations, and tracing slows the
+# run down.  Nothing is recorded unless the profiler was started.
+#
+# Forked workers record into their own copy; what they recorded is taken
+# and sent back with their output, and merged in the parent.
+
+REPORT_VERSION = 1
+
+
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.started = None
+        self.cprofile = None
+        self.phases = {}
+        self.traversals = []
+        self.counters = {}
+
+        # [name, peak so far] of each phase we are inside
+        self.stack = []
+        self.max_peak = 0
+
+    def start(self, cprofile=False):
+        self.enabled = True
+        self.started = time.perf_counter()
+        tracemalloc.start()
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_counters(self, counters):
+        if self.enabled:
+            self.counters.update(counters)
+
+    def _peak(self):
+        ''' the peak since the last call, starting over from here '''
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        self.max_peak = max(self.max_peak, peak)
+        return peak
+
+    @contextmanager
+    def phase(self, name, traversal=None):
+        ''' time and measure the block, and the traversal it draws if any '''
+        if not self.enabled:
+            yield
+            return
+
+        # The phase we are inside keeps the peak it reached until now
+        peak = self._peak()
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+
+        frame = [name, 0]
+        self.stack.append(frame)
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            self.stack.pop()
+            peak = max(frame[1], self._peak())
+            if self.stack:
+                self.stack[-1][1] = max(self.stack[-1][1], peak)
+
+            record = {
+                'calls': 1,
+                'wall': wall,
+                'peak_bytes': peak,
+                'allocated_bytes':
+                    tracemalloc.get_traced_memory()[0] - before,
+            }
+            self.add_phase(name, record)
+            if traversal is not None:
+                t = dict(traversal, **record)
+                del t['calls']
+                self.traversals.append(t)
+
+    def add_phase(self, name, record):
+        p = self.phases.get(name)
+        if p is None:
+            self.phases[name] = dict(record)
+            return
+        p['calls'] += record['calls']
+        p['wall'] += record['wall']
+        p['peak_bytes'] = max(p['peak_bytes'], record['peak_bytes'])
+        p['allocated_bytes'] += record['allocated_bytes']
+
+    # --------------------------------------------------------------------------
+    # Workers
+
+    def take(self):
+        ''' what was recorded so far, forgetting it '''
+        taken = (self.phases, self.traversals, self.counters)
+        self.phases = {}
+        self.traversals = []
+        self.counters = {}
+        return taken
+
+    def merge(self, taken):
+        phases, traversals, counters = taken
+        for name, record in phases.items():
+            self.add_phase(name, record)
+        self.traversals.extend(traversals)
+        for name, n in counters.items():
+            self.count(name, n)
+
+    # --------------------------------------------------------------------------
+    # Report
+
+    def report(self):
+        self._peak()
+        return {
+            'version': REPORT_VERSION,
+            'argv': sys.argv[1:],
+            'wall': time.perf_counter() - self.started,
+            'peak_bytes': self.max_peak,
+            'phases': self.phases,
+            'traversals': self.traversals,
+            'counters': self.counters,
+        }
+
+    def write(self, path):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(os.path.splitext(path)[0] + '.pstats')
+
+        with io.open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def graph_counters(modules, graph):
+    ''' the sizes of the graph, and how often resolution was cached '''
+    counters = {
+        'files': len(modules.files),
+        'externals': len(graph.externals),
+        'edges': graph.n_edges(),
+        'names_looked_up': modules.lookups,
+        'names_cached': modules.hits,
+        'ambiguous_resolutions': graph.resolved_hits + graph.resolved_misses,
+        'ambiguous_cached': graph.resolved_hits,
+    }
+    # The edge arrays, only if something built them
+    if graph._compact is not None:
+        counters['compact_graph_bytes'] = graph._compact.nbytes
+    return counters
+
+
+# The one profiler of the run
+profiler = Profiler()
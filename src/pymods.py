@@ -1,3 +1,12 @@
+import sys
+
+# -----------------------------------------------------------------------------
+# Python modules - the names that come with the interpreter
+#
+# The standard library is sys.stdlib_module_names, by top level package.
+# This list is only matched name for name, for the Python 2 modules and the
+# few third party ones it has always left out of the graph.
+
 PYMODS = (
     '__future__',
     '__main__',
@@ -175,7 +184,7 @@ PYMODS = (
     'types',
     'typing',
     'unicodedata',
-    'unittest'
+    'unittest',
     'urllib',
     'urllib.error',
     'urllib.parse',
@@ -198,3 +207,38 @@ PYMODS = (
     'zlib',
     'zoneinfo',
 )
+
+
+# Top level names only; a submodule is stdlib when its package is
+STDLIB = frozenset(
+    getattr(sys, 'stdlib_module_names', ()) or sys.builtin_module_names
+)
+
+# The rest of PYMODS (Python 2 names, and the few packages it has always
+# left out) only as listed, so e.g. requests.adapters is still drawn
+EXACT = frozenset(x for x in PYMODS if x.partition('.')[0] not in STDLIB)
+
+
+class Stdlib(object):
+    ''' is a module key part of the standard library, or treated as such? '''
+
+    def __init__(self, extra=None, builtin=True):
+        self.names = STDLIB if builtin else frozenset()
+        self.exact = EXACT if builtin else frozenset()
+        self.prefixes = ()
+
+        if extra:
+            names = set(x for x in extra if '.' not in x)
+            self.names = self.names.union(names)
+            self.prefixes = tuple(
+                x + '.' for x in extra if '.' in x
+            )
+
+    def __contains__(self, module_key):
+        if module_key.partition('.')[0] in self.names:
+            return True
+        if module_key in self.exact:
+            return True
+        if self.prefixes:
+            return (module_key + '.').startswith(self.prefixes)
+        return False
@@ -0,0 +1,155 @@
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# Reachability - what can reach what, computed once and shared by traversals
+
+
+def strongly_connected_components(successors):
+    ''' Tarjan's algorithm, without recursion, over lists of successor ids
+
+    The components come out in reverse topological order, sinks first
+    '''
+    n = len(successors)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, successors[root], 0]]
+
+        while work:
+            frame = work[-1]
+            v, succ, i = frame
+            if i < len(succ):
+                frame[2] = i + 1
+                w = succ[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, successors[w], 0])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
+
+
+class ReachabilityIndex(object):
+    def __init__(self, graph):
+        self.graph = graph
+        self.compact = graph.compact_graph()
+
+        # Condense the cycles
+        self.components = strongly_connected_components(self.compact.imports)
+        self.component = [0] * len(self.compact)
+        for c, members in enumerate(self.components):
+            for i in members:
+                self.component[i] = c
+
+        self._closures = {}
+        self._distances = {}
+
+    def __contains__(self, key):
+        return key in self.compact
+
+    def successors(self, i, forward=True):
+        return self.compact.successors(i, forward)
+
+    # --------------------------------------------------------------------------
+    # Transitive closure
+
+    def closure(self, forward=True):
+        ''' per component, a bitset of the node ids it can reach '''
+        if forward in self._closures:
+            return self._closures[forward]
+
+        # Tarjan lists sinks first, which is the order to combine them in
+        order = range(len(self.components))
+        if not forward:
+            order = reversed(order)
+
+        reach = [0] * len(self.components)
+        for c in order:
+            bits = 0
+            for i in self.components[c]:
+                bits |= 1 << i
+                for j in self.successors(i, forward):
+                    d = self.component[j]
+                    if d != c:
+                        bits |= reach[d]
+            reach[c] = bits
+
+        self._closures[forward] = reach
+        return reach
+
+    def reaches(self, source, target, forward=True):
+        ''' can source get to target along imports (or imported_by)? '''
+        a = self.compact.id_of(source)
+        b = self.compact.id_of(target)
+        if a is None or b is None:
+            return False
+        bits = self.closure(forward)[self.component[a]]
+        return bool(bits >> b & 1)
+
+    # --------------------------------------------------------------------------
+    # Distances
+
+    def distances(self, targets, forward=True):
+        ''' per id, how many edges it is from the nearest target, or -1 '''
+        key = (frozenset(str(x) for x in targets), forward)
+        if key in self._distances:
+            return self._distances[key]
+
+        dist = [-1] * len(self.compact)
+        queue = deque()
+        for k in key[0]:
+            i = self.compact.id_of(k)
+            if i is not None and dist[i] == -1:
+                dist[i] = 0
+                queue.append(i)
+
+        while queue:
+            v = queue.popleft()
+            for u in self.successors(v, not forward):
+                if dist[u] == -1:
+                    dist[u] = dist[v] + 1
+                    queue.append(u)
+
+        self._distances[key] = dist
+        return dist
+
+    def within(self, source, targets, depth, forward=True):
+        ''' can source reach any of the targets in at most depth edges? '''
+        i = self.compact.id_of(source)
+        if i is None:
+            return False
+        d = self.distances(targets, forward)[i]
+        return 0 <= d <= depth
@@ -0,0 +1,219 @@
+import json
+import os
+import socket
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .paths import path_edges
+
+# -----------------------------------------------------------------------------
+# Server - answer queries about the graph without building it again
+#
+# A query is a JSON object naming an op and its arguments
+#
+#     {"op": "imported_by", "module": "lib.pdb"}
+#
+# POSTed to /query, alone or as a list of them.  Each query gets back
+# {"result": ...} or {"error": "..."}, and a list gets back a list in the
+# same order, so hundreds of questions cost one round trip.
+#
+# The address is host:port for HTTP on localhost, or unix:PATH (or any path
+# with a slash in it) for a Unix socket.
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+
+class QueryError(Exception):
+    pass
+
+
+def parse_address(address):
+    ''' (socket family, address) '''
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if '/' in address:
+        return socket.AF_UNIX, address
+
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class Queries(object):
+    def __init__(self, options, graph, index):
+        self.options = options
+        self.graph = graph
+        self.index = index
+
+    def answer(self, query):
+        try:
+            if not isinstance(query, dict):
+                raise QueryError('a query is an object')
+            op = query.get('op')
+            handler = getattr(self, 'op_' + str(op), None)
+            if handler is None:
+                raise QueryError('unknown op {!r}'.format(op))
+            return {'result': handler(query)}
+        except QueryError as e:
+            return {'error': str(e)}
+        except Exception as e:
+            return {'error': '{}: {}'.format(type(e).__name__, e)}
+
+    def answer_all(self, request):
+        if isinstance(request, list):
+            return [self.answer(x) for x in request]
+        return self.answer(request)
+
+    # --------------------------------------------------------------------------
+    # Arguments
+
+    def node(self, query, name='module'):
+        if name not in query:
+            raise QueryError('missing {!r}'.format(name))
+        node = self.graph.lookup(query[name])
+        if node is None:
+            raise QueryError('{!r} not found'.format(query[name]))
+        return node
+
+    def forward(self, query):
+        return bool(query.get('forward', True))
+
+    def max_depth(self, query):
+        return int(query.get('max_depth', self.options.max_depth))
+
+    # --------------------------------------------------------------------------
+    # Ops
+
+    def op_ops(self, query):
+        return sorted(x[3:] for x in dir(self) if x.startswith('op_'))
+
+    def op_lookup(self, query):
+        return str(self.node(query))
+
+    def op_imports(self, query):
+        return sorted(str(x) for x in self.graph[self.node(query)].imports)
+
+    def op_imported_by(self, query):
+        return sorted(
+            str(x) for x in self.graph[self.node(query)].imported_by
+        )
+
+    def op_externals(self, query):
+        ''' every external, or those one module imports '''
+        if 'module' not in query:
+            return sorted(self.graph.externals)
+        imports = self.graph[self.node(query)].imports
+        return sorted(x for x in imports if x in self.graph.externals)
+
+    def op_reach(self, query):
+        ''' everything within max_depth (or any distance) of a module '''
+        start = self.node(query)
+        max_depth = query.get('max_depth')
+        return self.graph.reachable(
+            start, self.forward(query),
+            None if max_depth is None else int(max_depth)
+        )
+
+    def op_reaches(self, query):
+        return self.index.reaches(
+            self.node(query, 'from'), self.node(query, 'to'),
+            self.forward(query)
+        )
+
+    def op_connected(self, query):
+        nodes = [self.graph.lookup(x) for x in query.get('modules', ())]
+        if None in nodes:
+            raise QueryError('not all modules were found')
+        groups = self.graph.connected(nodes, self.forward(query))
+        return dict(
+            (str(k), sorted(str(x) for x in v)) for k, v in groups.items()
+        )
+
+    def op_paths(self, query):
+        ''' the edges on paths of at most max_depth + 1 between modules '''
+        start = self.node(query, 'from')
+        ends = query.get('to')
+        if not isinstance(ends, list):
+            ends = [ends]
+        targets = []
+        for x in ends:
+            node = self.graph.lookup(x)
+            if node is None:
+                raise QueryError('{!r} not found'.format(x))
+            targets.append(node)
+
+        edges = path_edges(
+            self.index.compact, start, targets, self.max_depth(query),
+            self.forward(query)
+        )
+        return sorted([str(e.start), str(e.end)] for e in edges)
+
+
+# -----------------------------------------------------------------------------
+# HTTP
+
+class QueryHandler(BaseHTTPRequestHandler):
+    queries = None
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/query':
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'null')
+        except ValueError as e:
+            self.reply(400, {'error': 'bad JSON: {}'.format(e)})
+            return
+
+        self.reply(200, self.queries.answer_all(request))
+
+    def reply(self, status, o):
+        body = json.dumps(o).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix sockets have no client address to show
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        print(format % args, file=sys.stderr)
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(options, graph, index):
+    family, address = parse_address(options.serve_address)
+    handler = type('Handler', (QueryHandler,), {
+        'queries': Queries(options, graph, index)
+    })
+
+    if family == socket.AF_UNIX:
+        server = UnixHTTPServer(address, handler)
+    else:
+        server = ThreadingHTTPServer(address, handler)
+
+    print('Serving on {} (Ctrl-C to stop)'.format(options.serve_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)
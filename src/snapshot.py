@@ -0,0 +1,195 @@
+import gc
+import io
+import json
+import os
+import sys
+from array import array
+
+from .compact import Adjacency, CompactGraph
+from .file import File
+from .graph import ImportsGraph, ImportsGraphNode
+from .modules import Modules
+from .store import GraphStore
+
+# -----------------------------------------------------------------------------
+# Snapshot - the built graph, saved to load instead of scanning again
+#
+# Plain data, nothing that runs code as it is read.  A first line with the
+# magic and the version, checked before anything else is decoded; then a
+# line of JSON with the node keys (files first, in discovery order, then
+# externals), the module keys each file imports, so a loaded graph can
+# still be updated (null from the csr and sqlite backends, which drop
+# them), and the length of each array; then the raw bytes of the imports
+# and imported_by of each node, as compressed sparse rows of ids.
+# The csr backend uses the rows as they are; the dict backend fills its
+# sets from them, and the sqlite backend its tables.  The module names are
+# only indexed again if something asks for them.
+
+SNAPSHOT_MAGIC = 'lift-snapshot'
+SNAPSHOT_VERSION = 2
+
+# The rows, in the order their bytes follow the header
+ARRAYS = ('imports', 'imported_by')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def signature(options):
+    ''' the options that change what the graph holds '''
+    return {
+        'modules_path': options.modules_path,
+        'source_roots': options.source_roots,
+        'exclude': options.exclude,
+        'include_tests': options.include_tests,
+        'exclude_unused': options.exclude_unused,
+        'treat_as_stdlib': options.treat_as_stdlib,
+        'include_stdlib': options.include_stdlib,
+        'extractor': options.extractor,
+        'imports_scope': options.imports_scope,
+    }
+
+
+def save_snapshot(path, options, graph):
+    c = graph.compact_graph()
+    rows = {'imports': c.imports, 'imported_by': c.imported_by}
+    header = {
+        'signature': signature(options),
+        'byteorder': sys.byteorder,
+        'itemsize': array('i').itemsize,
+        'keys': c.keys,
+        'n_local': c.n_local,
+        'imported_keys': None if graph._imported_keys is None else [
+            list(graph._imported_keys.get(k, ()))
+            for k in c.keys[:c.n_local]
+        ],
+        'arrays': [
+            [len(rows[x].offsets), len(rows[x].targets)] for x in ARRAYS
+        ],
+    }
+
+    tmp = path + '.tmp'
+    with io.open(tmp, 'wb') as f:
+        f.write('{} {}\n'.format(SNAPSHOT_MAGIC, SNAPSHOT_VERSION).encode())
+        f.write(json.dumps(header).encode('utf-8'))
+        f.write(b'\n')
+        for x in ARRAYS:
+            rows[x].offsets.tofile(f)
+            rows[x].targets.tofile(f)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    ''' (header, {name: Adjacency}) as they were saved '''
+    try:
+        with io.open(path, 'rb') as f:
+            first = f.readline(64).split()
+            if len(first) != 2 or first[0] != SNAPSHOT_MAGIC.encode():
+                raise SnapshotError('{} is not a snapshot'.format(path))
+            if first[1] != str(SNAPSHOT_VERSION).encode():
+                raise SnapshotError('{} is snapshot version {}, not {}'.format(
+                    path, first[1].decode(errors='replace'),
+                    SNAPSHOT_VERSION))
+
+            header = json.loads(f.readline().decode('utf-8'))
+            return header, read_rows(path, f, header)
+    except (OSError, EOFError, ValueError, TypeError, KeyError) as e:
+        raise SnapshotError('cannot read {}: {}'.format(path, e))
+
+
+def read_rows(path, f, header):
+    if (header['byteorder'] != sys.byteorder or
+            header['itemsize'] != array('i').itemsize):
+        raise SnapshotError('{} was saved on another platform'.format(path))
+
+    n = len(header['keys'])
+    rows = {}
+    for x, (n_offsets, n_targets) in zip(ARRAYS, header['arrays']):
+        offsets = array('i')
+        targets = array('i')
+        offsets.fromfile(f, n_offsets)
+        targets.fromfile(f, n_targets)
+
+        # A bad id would only fail later, far from the cause
+        if (len(offsets) != n + 1 or offsets[0] != 0 or
+                offsets[-1] != len(targets) or
+                (targets and not 0 <= min(targets) <= max(targets) < n)):
+            raise SnapshotError('{} is damaged'.format(path))
+        rows[x] = Adjacency.from_arrays(offsets, targets)
+    return rows
+
+
+def load_snapshot(path, options):
+    ''' (modules, graph) as they were saved '''
+    header, rows = read_snapshot(path)
+    if header['signature'] != signature(options):
+        if not options.force_snapshot:
+            raise SnapshotError(
+                '{} was saved with other options, and --force-snapshot was '
+                'not given,'.format(path))
+        print(path, 'was saved with other options, using it anyway',
+              file=sys.stderr)
+    if header['imported_keys'] is None and options.watch:
+        raise SnapshotError(
+            '{} was saved from a frozen graph, without the imports --watch '
+            'needs,'.format(path))
+
+    # Nothing made here can be a cycle, so spare the collector the work
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return fill_graph(header, rows, options)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def fill_graph(header, rows, options):
+    keys = header['keys']
+    n_local = header['n_local']
+    imports = rows['imports']
+
+    files = [File(k) for k in keys[:n_local]]
+    modules = Modules(options, files)
+    graph = ImportsGraph(options, modules, build=False)
+    imported_keys = header['imported_keys']
+    if imported_keys is None or options.graph_backend != 'dict':
+        graph._imported_keys = None
+    else:
+        graph._imported_keys = dict(zip(keys[:n_local], imported_keys))
+
+    nodes = files + keys[n_local:]
+    imported_by = rows['imported_by']
+    if options.graph_backend == 'csr':
+        graph._compact = CompactGraph.from_adjacency(
+            keys, nodes, n_local, imports, imported_by
+        )
+        graph.freeze()
+        return modules, graph
+
+    if options.graph_backend == 'sqlite':
+        store = GraphStore(options.graph_store)
+        store.add_nodes(keys[:n_local], True)
+        store.add_nodes(keys[n_local:], False)
+        store.add_edges(
+            (i, j) for i in range(n_local) for j in imports[i]
+        )
+        graph.attach(store)
+        graph._compact = CompactGraph.from_adjacency(
+            keys, nodes, n_local, imports, imported_by
+        )
+        return modules, graph
+
+    for i, f in enumerate(files):
+        graph.nodes[f.full_path] = ImportsGraphNode(
+            f,
+            set([nodes[j] for j in imports[i]]),
+            set([nodes[j] for j in imported_by[i]])
+        )
+    for i in range(n_local, len(keys)):
+        graph.externals[keys[i]] = ImportsGraphNode(
+            keys[i], set(), set([nodes[j] for j in imported_by[i]])
+        )
+
+    return modules, graph
@@ -0,0 +1,283 @@
+import sqlite3
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+
+# -----------------------------------------------------------------------------
+# Store - the graph in SQLite, for trees too big for sets in memory
+#
+# Nodes are numbered as in the CompactGraph, files first in discovery order
+# and then externals as they are first imported.  Edges are kept both ways
+# round by their indexes, so imports and imported_by are each one indexed
+# lookup, and reachability is a recursive query.  Only the keys and ids of
+# the nodes stay in memory; traversals walk the edges a query at a time
+# through a StoreGraph, and only the reachability index (for cycles,
+# metrics and the server) reads every edge out into the compact arrays.
+#
+# The connection is shared by the server's threads, one query at a time.
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    local INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edges (
+    src INTEGER NOT NULL,
+    dst INTEGER NOT NULL,
+    PRIMARY KEY (src, dst)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_dst ON edges (dst, src);
+CREATE TABLE IF NOT EXISTS modules (
+    key TEXT NOT NULL,
+    file INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modules_key ON modules (key);
+'''
+
+# Rows to gather before each insert
+BATCH = 50000
+
+
+class GraphStore(object):
+    def __init__(self, path=''):
+        # An empty path is a temporary database on disk, gone when closed
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute('PRAGMA journal_mode = OFF')
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.execute('PRAGMA cache_size = -65536')
+        self.db.execute('DROP TABLE IF EXISTS nodes')
+        self.db.execute('DROP TABLE IF EXISTS edges')
+        self.db.execute('DROP TABLE IF EXISTS modules')
+        self.db.executescript(SCHEMA)
+
+        self.keys = []
+        self.ids = {}
+        self.n_local = 0
+        self.pending = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def close(self):
+        self.db.close()
+
+    # --------------------------------------------------------------------------
+    # Building
+
+    def add_nodes(self, keys, local):
+        rows = []
+        for key in keys:
+            if key not in self.ids:
+                self.ids[key] = len(self.keys)
+                self.keys.append(key)
+                rows.append((self.ids[key], key, local))
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO nodes (id, key, local) VALUES (?, ?, ?)', rows
+            )
+        if local:
+            self.n_local = len(self.ids)
+
+    def add_edge(self, src, dst):
+        ''' src and dst are keys; an unknown dst becomes an external '''
+        j = self.ids.get(dst)
+        if j is None:
+            self.add_nodes([dst], False)
+            j = self.ids[dst]
+        self.pending.append((self.ids[src], j))
+        if len(self.pending) >= BATCH:
+            self.flush()
+
+    def add_edges(self, pairs):
+        ''' (src id, dst id) pairs between nodes already added '''
+        self.pending.extend(pairs)
+        self.flush()
+
+    def flush(self):
+        with self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO edges (src, dst) VALUES (?, ?)',
+                self.pending
+            )
+        self.pending = []
+
+    def add_modules(self, rows):
+        ''' (module key, file key) pairs '''
+        ids = self.ids
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO modules (key, file) VALUES (?, ?)',
+                ((k, ids[f]) for k, f in rows)
+            )
+
+    # --------------------------------------------------------------------------
+    # Queries
+
+    def is_local(self, i):
+        return i < self.n_local
+
+    def successors(self, i, forward=True):
+        if forward:
+            sql = 'SELECT dst FROM edges WHERE src = ? ORDER BY dst'
+        else:
+            sql = 'SELECT src FROM edges WHERE dst = ? ORDER BY src'
+        return self.query(sql, (i,))
+
+    def query(self, sql, args=()):
+        ''' the first column of each row '''
+        with self.lock:
+            return [x for x, in self.db.execute(sql, args)]
+
+    def n_edges(self):
+        return self.query('SELECT COUNT(*) FROM edges')[0]
+
+    def unimported(self):
+        ''' the keys of the files nothing imports '''
+        return self.query(
+            'SELECT key FROM nodes WHERE local AND NOT EXISTS '
+            '(SELECT 1 FROM edges WHERE dst = nodes.id) ORDER BY id'
+        )
+
+    def reachable(self, key, max_depth, forward=True):
+        ''' {key: fewest edges away} for everything within max_depth '''
+        i = self.ids.get(key)
+        if i is None:
+            return {}
+        a, b = ('src', 'dst') if forward else ('dst', 'src')
+
+        # Rows are (id, depth), so the depth bound is what ends a cycle
+        sql = '''
+            WITH RECURSIVE r(id, depth) AS (
+                SELECT ?, 0
+                UNION
+                SELECT e.{b}, r.depth + 1 FROM r
+                JOIN edges e ON e.{a} = r.id
+                WHERE r.depth < ?
+            )
+            SELECT n.key, MIN(r.depth) FROM r JOIN nodes n ON n.id = r.id
+            GROUP BY r.id
+        '''.format(a=a, b=b)
+        with self.lock:
+            return dict(self.db.execute(sql, (i, max_depth)))
+
+    def adjacency(self, forward=True):
+        ''' (offsets, targets) arrays for every node, as in Adjacency '''
+        if forward:
+            sql = 'SELECT src, dst FROM edges ORDER BY src, dst'
+        else:
+            sql = 'SELECT dst, src FROM edges ORDER BY dst, src'
+
+        offsets = array('i', [0])
+        targets = array('i')
+        row = 0
+        with self.lock:
+            for i, j in self.db.execute(sql):
+                while row < i:
+                    offsets.append(len(targets))
+                    row += 1
+                targets.append(j)
+        while row < len(self.ids):
+            offsets.append(len(targets))
+            row += 1
+        return offsets, targets
+
+
+class StoreNodeList(Sequence):
+    ''' the node of each id: its File if local, otherwise its key '''
+
+    def __init__(self, store, files):
+        self.store = store
+        self.files = files
+
+    def __getitem__(self, i):
+        key = self.store.keys[i]
+        return self.files[key] if self.store.is_local(i) else key
+
+    def __len__(self):
+        return len(self.store.keys)
+
+
+class StoreAdjacency(object):
+    ''' the imports (or imported_by) of each id, as in Adjacency '''
+
+    def __init__(self, store, forward):
+        self.store = store
+        self.forward = forward
+
+    def __len__(self):
+        return len(self.store.keys)
+
+    def __getitem__(self, i):
+        return self.store.successors(i, self.forward)
+
+    def degree(self, i):
+        return len(self[i])
+
+
+class StoreGraph(object):
+    ''' what a search needs of a CompactGraph, a query per node expanded '''
+
+    def __init__(self, store, files):
+        self.store = store
+        self.keys = store.keys
+        self.ids = store.ids
+        self.n_local = store.n_local
+        self.nodes = StoreNodeList(store, files)
+        self.imports = StoreAdjacency(store, True)
+        self.imported_by = StoreAdjacency(store, False)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return str(key) in self.ids
+
+    def id_of(self, key):
+        return self.ids.get(str(key))
+
+    def is_local(self, i):
+        return i < self.n_local
+
+    def successors(self, i, forward=True):
+        return self.imports[i] if forward else self.imported_by[i]
+
+
+class StoreNodes(Mapping):
+    ''' the local (or external) nodes of a GraphStore, shaped like a dict '''
+
+    def __init__(self, store, factory, files, local):
+        self.store = store
+        self.factory = factory
+        self.node_list = StoreNodeList(store, files)
+        self.local = local
+
+    def nodes(self, ids):
+        return tuple(self.node_list[i] for i in ids)
+
+    def __contains__(self, key):
+        i = self.store.ids.get(key)
+        return i is not None and self.store.is_local(i) == self.local
+
+    def __getitem__(self, key):
+        i = self.store.ids.get(key)
+        if i is None or self.store.is_local(i) != self.local:
+            raise KeyError(key)
+
+        return self.factory(
+            self.node_list[i],
+            self.nodes(self.store.successors(i, True)),
+            self.nodes(self.store.successors(i, False))
+        )
+
+    def __iter__(self):
+        keys = self.store.keys
+        if self.local:
+            return iter(keys[:self.store.n_local])
+        return iter(keys[self.store.n_local:])
+
+    def __len__(self):
+        if self.local:
+            return self.store.n_local
+        return len(self.store.ids) - self.store.n_local
@@ -1,14 +1,10 @@
-import itertools
-
 from .file import File
 
 
 class Subgraph(object):
-    id_iter = itertools.count(100, 10)
-
     def __init__(self, label, manager):
         assert(label)
-        self.id = next(self.id_iter)
+        self.id = None
         self.label = label
         self.manager = manager
         self.nodes = set()
@@ -39,29 +35,32 @@ class Subgraphs(dict):
 
         self.build_subgraphs(relations)
         self.build_hierarchy()
+        self.number()
 
     def __missing__(self, key):
         value = self[key] = Subgraph(key, self)
         return value
 
     def build_hierarchy(self):
-        # Build hierarchy
-        # Sort paths in longest to shortest order
-        rev_paths = sorted(self.keys(), key=len, reverse=True)
-
-        while rev_paths:
-            # pop the longest path
-            y = self[rev_paths.pop(0)]
-
-            # looking through the rest of the list,
-            # starting longest moving shortest
-            for k in rev_paths:
-                x = self[k]
-                xl = x.label
-                yl = y.label
-                if xl in yl and x.synecdoche.is_ancestor(y.synecdoche) == 1:
+        ''' hang each subgraph under its nearest enclosing subgraph
+
+        The labels are dotted paths, so the labels themselves index every
+        package by its components, and the parent of a.b.c is the first of
+        a.b and a that is here
+        '''
+        for label in sorted(self):
+            y = self[label]
+            parts = label.split('.')
+            for k in range(len(parts) - 1, 0, -1):
+                x = self.get('.'.join(parts[:k]))
+                if x is not None and x.synecdoche.is_ancestor(y.synecdoche):
                     x.add_subgraph_child(y)
-                    break  # stop finding ancestors of this element
+                    break
+
+    def number(self):
+        ''' cluster ids that only depend on the labels '''
+        for i, label in enumerate(sorted(self)):
+            self[label].id = 100 + 10 * i
 
     def build_subgraphs(self, relations):
         for r in relations:
@@ -1,14 +1,35 @@
+import sys
+
+from .dot import TraversalWriter
 from .edge import Edge
-from .file import File
+from .importtime import expensive_chains
+from .manifest import digest_lines
+from .paths import path_edges
+from .profiling import profiler
 from .subgraphs import Subgraphs
 
 
+PATH_ENGINES = ('reach', 'enumerate', 'compare')
+
+# Bump when the output changes for the same traversal
+DOT_FORMAT = 5
+
+
+def traversal_targets(options, graph, forward=True):
+    ''' where the paths of a forward (or backward) traversal may end '''
+    if forward:
+        return options.ends
+    return graph.sources + options.highlights
+
+
 # -----------------------------------------------------------------------------
 # Traversal - tracks a path through the graph
 
 class Traversal(object):
-    def __init__(self, options, graph, initial_node, forward=True):
+    def __init__(self, options, graph, initial_node, forward=True,
+                 index=None):
         self.graph = graph
+        self.index = index
         self.options = options
         self.initial_node = initial_node
         if initial_node in graph:
@@ -17,29 +38,77 @@ class Traversal(object):
         self.forward = forward
 
         # Get the root nodes
-        self.roots = [self.graph[x].node for x in options.starts]
-
-        self.relations = self._find_paths()
+        self.roots = [
+            self.graph[x].node for x in options.starts if x in self.graph
+        ]
+
+        with profiler.phase('paths'):
+            self.relations = self._find_paths()
+
+        costs = graph.costs
+        if forward and costs and options.importtime_chains:
+            self.relations = expensive_chains(
+                self.relations, self.initial_node, costs,
+                options.importtime_chains
+            )
 
-        self.subgraphs = Subgraphs(self.relations)
+        with profiler.phase('subgraphs'):
+            self.subgraphs = Subgraphs(self.relations)
 
+        ends = frozenset(options.ends)
         self.sinks = set(
-            [r.end for r in self.relations if r.end in options.ends]
+            [r.end for r in self.relations if r.end in ends]
         )
 
     def _find_paths(self):
-        if self.forward:
-            paths = self.graph.find_all_paths(
-                self.initial_node, self.options.ends
+        targets = traversal_targets(self.options, self.graph, self.forward)
+
+        engine = self.options.path_engine
+        if engine == 'enumerate':
+            return self._enumerate_paths(targets)
+
+        if not self.forward and self.initial_node not in self.graph:
+            print(self.initial_node, 'not found!')
+
+        if self.index is None:
+            compact = self.graph.search_graph()
+            togo = None
+        else:
+            compact = self.index.compact
+            togo = self.index.distances(targets, self.forward)
+
+        if togo is not None and not self.index.within(
+            self.initial_node, targets, self.options.max_depth + 1,
+            self.forward
+        ):
+            edges = set()
+        else:
+            edges = path_edges(
+                compact,
+                self.initial_node,
+                targets,
+                self.options.max_depth,
+                self.forward,
+                togo
             )
+
+        if engine == 'compare':
+            expected = self._enumerate_paths(targets)
+            for e in sorted(str(x) for x in edges.difference(expected)):
+                print('\tunexpected', e, file=sys.stderr)
+            for e in sorted(str(x) for x in expected.difference(edges)):
+                print('\tmissing', e, file=sys.stderr)
+
+        return edges
+
+    def _enumerate_paths(self, targets):
+        if self.forward:
+            paths = self.graph.find_all_paths(self.initial_node, targets)
         else:
-            l = []
-            l += self.graph.sources
-            l += self.options.highlights
-            
             paths = self.graph.find_all_paths_backward(
-                self.initial_node, l
+                self.initial_node, targets
             )
+        profiler.count('paths_enumerated', len(paths))
 
         edges = set()
 
@@ -63,100 +132,41 @@ class Traversal(object):
 
         return edges
 
+    def render_inputs(self):
+        ''' everything the output is drawn from, in a stable order '''
+        nodes = self.subgraphs.all_nodes
+        yield 'format {}'.format(DOT_FORMAT)
+        yield 'comments {}'.format(self.options.edge_comments)
+        yield 'initial {}'.format(self.initial_node)
+        yield 'forward {}'.format(self.forward)
+        yield 'max_depth {}'.format(self.options.max_depth)
+        for r in sorted(str(r) for r in self.relations):
+            yield 'edge ' + r
+        for n in sorted(str(n) for n in self.roots if n in nodes):
+            yield 'root ' + n
+        for n in sorted(str(n) for n in self.options.highlights
+                        if n in nodes):
+            yield 'highlight ' + n
+        for p in sorted(self.sinks):
+            yield 'sink ' + p
+
+        costs = self.graph.costs
+        if costs:
+            yield 'hottest {}'.format(max(
+                x.cumulative_us for x in costs.values()
+            ))
+            for n in sorted(list(map(str, nodes)) + list(self.sinks)):
+                if n in costs:
+                    yield 'cost {} {} {}'.format(n, *costs[n])
+
+    def digest(self):
+        return digest_lines(self.render_inputs())
+
+    def writer(self):
+        return TraversalWriter(self, self.options.edge_comments)
+
     def output_dot(self, outfile):
-        visited_sg = set()
-
-        def output_sg(f, sg, d, parent_label):
-            if sg in visited_sg:
-                return
-
-            tabs = '\t' * d
-            label = sg.label.replace(parent_label, '').strip('.')
-
-            if sg.size == 1 and not sg.sg_children:
-                n = sg.synecdoche
-                print('{}{} [label="{}.{}" shape="component"]\n'.format(
-                    tabs, n.gv_name, label, n.basename
-                ), file=f)
-            else:
-                print('{}subgraph cluster_{} {{'.format(tabs, sg.id), file=f)
-                print('{}\tlabel="{}"\n'.format(tabs, label), file=f)
-                for csg in sg.sg_children:
-                    output_sg(f, csg, d + 1, sg.label)
-                for n in sg.nodes:
-                    if n in self.roots:
-                        print('{}\t{} [style=filled fillcolor=gold]'.format(
-                            tabs, n.gv_name), file=f
-                        )
-                    elif n in self.options.highlights:
-                        print('{}\t{} [style=filled fillcolor=skyblue1]'.format(
-                            tabs, n.gv_name), file=f
-                        )
-                    else:
-                        print('{}\t{}'.format(tabs, n.gv_name), file=f)
-                print('{}}}\n'.format(tabs), file=f)
-
-            visited_sg.add(sg)
-
-        with open(outfile, 'w') as f:
-            print('digraph imports {', file=f)
-            print('\trankdir=LR;', file=f)
-            print('\tcompound=true', file=f)
-            print('\tnode [fontsize=10 shape="rect"]', file=f)
-            print('\tedge [fontsize=9]', file=f)
-            print('\n', file=f)
-
-            for k in sorted(self.subgraphs.keys(), key=len):
-                sg = self.subgraphs[k]
-                output_sg(f, sg, 1, '')
-
-            print('\n', file=f)
-            for p in sorted(self.sinks):
-                print(
-                    '\t{} [label="{}" style=filled fillcolor=salmon]'.format(
-                        p.replace('.', '_'), p),
-                    file=f
-                )
-
-            print('\n', file=f)
-            for r in self.relations:
-                assert(isinstance(r.start, File))
-                # Both are local modules
-                if isinstance(r.end, File):
-                    # sga = self.subgraphs.all_nodes[r.start]
-                    # sgb = self.subgraphs.all_nodes[r.end]
-
-                    a = r.start.gv_name
-                    b = r.end.gv_name
-
-                    comment = ''
-                    if r.start.is_sibling(r.end):
-                        comment = '/* sibling {} */'.format(
-                            r.start.dotted_path)
-                    elif r.start.is_ancestor(r.end):
-                        comment = '/* family {} */'.format(
-                            r.start.relative_label(r.end))
-                    elif r.end.is_ancestor(r.start):
-                        comment = '/* family {} */'.format(
-                            r.end.relative_label(r.start))
-                    else:
-                        comment = '/* neighbors {} */'.format(
-                            r.start.distance(r.end))
-
-                    # if sga.size > 1 and sgb.size > 1:
-                    #     a = sga.synecdoche.basename
-                    #     b = sgb.synecdoche.basename
-                    #     print(
-                    #         '\t{} -> {} [ltail="cluster_{}"
-                    #                      lhead="cluster_{}"]'.format(
-                    #             a, b, sga.id, sgb.id
-                    #         ),
-                    #         file=f)
-                    # else:
-                    print('\t{} -> {}'.format(a, b), comment, file=f)
-                else:
-                    a = r.start.gv_name
-                    b = r.end.replace('.', '_')
-                    print('\t{} -> {} /* ext */'.format(a, b), file=f)
-
-            print('}', file=f)
+        self.writer().write(outfile, 'dot')
+
+    def output_json(self, outfile):
+        self.writer().write(outfile, 'json')
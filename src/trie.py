@@ -0,0 +1,132 @@
+import os.path
+
+# -----------------------------------------------------------------------------
+# Trie - module names indexed by their last component first
+#
+# A file may be imported by any dotted suffix of its name below its source
+# root, so ./src/pkg/sub/mod.py answers to `mod`, `sub.mod` and
+# `pkg.sub.mod`.  Rather than a key per suffix, each file is stored once, at
+# the end of its name reversed:
+#
+#     mod -> sub -> pkg   holds ./src/pkg/sub/mod.py
+#
+# and the files a key can mean are those at or below the node the key leads
+# to.  A package's __init__ answers only to its own directory name.
+
+# Path components that end a module name
+STOPS = frozenset(['', '.', '..'])
+
+
+class TrieNode(object):
+    __slots__ = ('children', 'files')
+
+    def __init__(self):
+        self.children = None
+        self.files = None
+
+    def child(self, name):
+        if self.children is None:
+            self.children = {}
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = TrieNode()
+        return node
+
+    def walk(self):
+        ''' every file at or below this node '''
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.files:
+                yield from node.files
+            if node.children:
+                stack.extend(node.children.values())
+
+
+class ModuleTrie(object):
+    def __init__(self, roots=None):
+        # Longest first, so nested roots win
+        self.roots = sorted(
+            set(os.path.normpath(x) for x in roots or ['.']),
+            key=len, reverse=True
+        )
+        self.root = TrieNode()
+        self.order = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def name_of(self, node):
+        ''' the components of node's module name, below its source root '''
+        if node.is_init:
+            return [node.basename]
+
+        d = os.path.normpath(node.path_to)
+        for root in self.roots:
+            if root == '.':
+                break
+            if d == root:
+                d = '.'
+                break
+            if d.startswith(root + '/'):
+                d = d[len(root) + 1:]
+                break
+
+        parts = d.split('/')
+        i = len(parts)
+        while i and parts[i - 1] not in STOPS:
+            i -= 1
+        return parts[i:] + [node.basename]
+
+    def keys_of(self, node):
+        ''' every dotted name node answers to, shortest first '''
+        name = self.name_of(node)
+        return [
+            '.'.join(name[i:]) for i in range(len(name) - 1, -1, -1)
+        ]
+
+    def find(self, key):
+        t = self.root
+        for part in reversed(key.split('.')):
+            if t.children is None:
+                return None
+            t = t.children.get(part)
+            if t is None:
+                return None
+        return t
+
+    def add(self, node):
+        t = self.root
+        for part in reversed(self.name_of(node)):
+            t = t.child(part)
+        if t.files is None:
+            t.files = []
+        t.files.append(node)
+        self.order[node] = self.counter
+        self.counter += 1
+
+    def remove(self, node):
+        t = self.find('.'.join(self.name_of(node)))
+        if t is not None and t.files and node in t.files:
+            t.files.remove(node)
+        self.order.pop(node, None)
+
+    def candidates(self, key):
+        ''' the files key may mean, in the order they were added '''
+        t = self.find(key)
+        if t is None:
+            return []
+        return sorted(t.walk(), key=self.order.__getitem__)
+
+    def keys(self):
+        ''' every dotted name at least one file answers to '''
+        stack = [(self.root, [])]
+        while stack:
+            t, name = stack.pop()
+            if name and (t.files or t.children):
+                if any(True for _ in t.walk()):
+                    yield '.'.join(reversed(name))
+            if t.children:
+                for part, child in t.children.items():
+                    stack.append((child, name + [part]))
@@ -0,0 +1,79 @@
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# Walk - iterative breadth and depth first searches over the imports graph
+#
+# Both are generators of (node, depth, parent) so a caller can stop as soon
+# as it has what it needs.  `visited` may be shared between walks; a node in
+# it is never yielded or expanded.
+
+
+def neighbors(graph, node, forward=True):
+    ign = graph[node]
+    if ign is None:
+        return ()
+    return ign.imports if forward else ign.imported_by
+
+
+def bfs(graph, start, forward=True, max_depth=None, visited=None):
+    ''' yields (node, depth, parent), nearest first '''
+    if visited is None:
+        visited = set()
+    if start in visited:
+        return
+
+    visited.add(start)
+    queue = deque([(start, 0, None)])
+    while queue:
+        node, depth, parent = queue.popleft()
+        yield node, depth, parent
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for successor in neighbors(graph, node, forward):
+            if successor not in visited:
+                visited.add(successor)
+                queue.append((successor, depth + 1, node))
+
+
+def dfs(graph, start, forward=True, max_depth=None, visited=None,
+        postorder=False):
+    ''' yields (node, depth, parent), going deep first
+
+    With postorder, each node comes out after everything below it
+    '''
+    if visited is None:
+        visited = set()
+    if start in visited:
+        return
+
+    visited.add(start)
+    if not postorder:
+        yield start, 0, None
+
+    stack = [(start, 0, None, iter(neighbors(graph, start, forward)))]
+    while stack:
+        node, depth, parent, successors = stack[-1]
+
+        successor = None
+        if max_depth is None or depth < max_depth:
+            for x in successors:
+                if x not in visited:
+                    successor = x
+                    break
+
+        if successor is None:
+            stack.pop()
+            if postorder:
+                yield node, depth, parent
+            continue
+
+        visited.add(successor)
+        if not postorder:
+            yield successor, depth + 1, node
+        stack.append((
+            successor,
+            depth + 1,
+            node,
+            iter(neighbors(graph, successor, forward))
+        ))
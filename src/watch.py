@@ -0,0 +1,153 @@
+import os
+import os.path
+import sys
+import time
+
+from .discovery import Discovery, discover
+from .output import output_dumps, output_traversals
+from .reachability import ReachabilityIndex
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+# -----------------------------------------------------------------------------
+# Watch - keep the graph live, applying only what changed on disk
+#
+# Between passes the watcher sleeps, or with inotify_simple installed waits
+# for the kernel to say a directory changed, watching every directory the
+# walk looks in and each new one as it appears.  Each pass walks the tree
+# again and compares the mtime and size of every file with the last pass;
+# the files that differ are handed to ImportsGraph.update, and only the
+# traversals that come within max_depth + 1 of a node an edge came or went
+# at are drawn again.  The dumps of the modules, graph and externals are
+# each one document, written whole, so they are only written again with
+# --watch-dumps.
+
+
+def stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Watcher(object):
+    def __init__(self, options, modules, graph):
+        assert(not graph.frozen)
+        self.options = options
+        self.modules = modules
+        self.graph = graph
+        self.interval = options.watch_interval
+
+        self.stamps = dict(
+            (x.full_path, stamp(x.full_path)) for x in modules.files
+        )
+
+        self.inotify = None
+        if inotify_simple is not None:
+            self.inotify = inotify_simple.INotify()
+            self.add_watches()
+
+    def add_watches(self):
+        flags = inotify_simple.flags
+        mask = (
+            flags.CLOSE_WRITE | flags.CREATE | flags.DELETE |
+            flags.MOVED_FROM | flags.MOVED_TO
+        )
+        for directory in Discovery(self.options).directories():
+            try:
+                self.inotify.add_watch(directory, mask)
+            except OSError:
+                pass
+
+    def wait(self):
+        if self.inotify is None:
+            time.sleep(self.interval)
+            return
+
+        # Let a burst of saves settle into one pass
+        events = self.inotify.read(read_delay=int(self.interval * 1000))
+
+        # A new package needs watching before files appear in it
+        flags = inotify_simple.flags
+        if any(
+            x.mask & flags.ISDIR and x.mask & (flags.CREATE | flags.MOVED_TO)
+            for x in events
+        ):
+            self.add_watches()
+
+    def affected(self, touched):
+        ''' the (forward, key) traversals that reach a touched node '''
+        limit = self.options.max_depth + 1
+        items = set()
+        for forward, keys in (
+            (True, self.options.starts), (False, self.options.ends)
+        ):
+            for k in keys:
+                if any(
+                    str(x) in touched
+                    for x, _, _ in self.graph.walk(k, forward, limit)
+                ):
+                    items.add((forward, k))
+        return items
+
+    def poll(self):
+        ''' apply whatever changed since the last pass, if anything '''
+        started = time.perf_counter()
+
+        found = dict((x.full_path, x) for x in discover(self.options))
+        stamps = dict((k, stamp(k)) for k in found)
+        known = dict((x.full_path, x) for x in self.modules.files)
+
+        added = [found[k] for k in found if k not in known]
+        removed = [known[k] for k in known if k not in found]
+        modified = [
+            known[k] for k in found
+            if k in known and stamps[k] != self.stamps.get(k)
+        ]
+        self.stamps = stamps
+        if not (added or removed or modified):
+            return False
+
+        for label, nodes in (
+            ('added', added), ('changed', modified), ('removed', removed)
+        ):
+            for node in nodes:
+                print('Watch {} {}'.format(label, node.full_path))
+
+        touched = self.graph.update(added, modified, removed)
+        if self.options.watch_dumps:
+            output_dumps(self.options, self.modules, self.graph)
+
+        for k in self.options.starts:
+            if k not in self.graph:
+                print('Watch start {} not found'.format(k))
+
+        only = self.affected(touched)
+        print('Watch drawing {} of {} traversals'.format(
+            len(only), len(self.options.starts) + len(self.options.ends)))
+        if only:
+            output_traversals(
+                self.options, self.graph, ReachabilityIndex(self.graph), only
+            )
+
+        print('Watch updated in {:.3f}s'.format(
+            time.perf_counter() - started))
+        return True
+
+    def run(self):
+        print('Watching {} (Ctrl-C to stop)'.format(
+            self.options.modules_path))
+        try:
+            while True:
+                self.wait()
+                self.poll()
+        except KeyboardInterrupt:
+            print('', file=sys.stderr)
+
+
+def watch(options, modules, graph):
+    Watcher(options, modules, graph).run()
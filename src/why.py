@@ -0,0 +1,175 @@
+import heapq
+
+from .file import File
+
+# -----------------------------------------------------------------------------
+# Why - the shortest chains of imports from one module to another
+#
+# A breadth first search from each end, over imports from the start and
+# imported_by from the end, always growing the smaller frontier, so the two
+# meet in the middle having seen far less of the graph than a search from
+# one end would.  The k shortest loop-free chains come from Yen's method:
+# each next chain branches off one already found, at some node, with the
+# edges the found chains take from there banned.
+#
+# Everything runs on the integer ids of the CompactGraph.
+
+
+def expand(frontier, seen, other, adjacency, banned_nodes, banned_edges,
+           forward):
+    ''' grow one side a level, returning (next frontier, best meeting) '''
+    following = []
+    meet = None
+    for u in frontier:
+        depth = seen[u][1] + 1
+        for v in adjacency[u]:
+            if v in seen or v in banned_nodes:
+                continue
+            if banned_edges and (
+                (u, v) if forward else (v, u)
+            ) in banned_edges:
+                continue
+            seen[v] = (u, depth)
+            following.append(v)
+
+            # Finish the level, in case a closer meeting comes later in it
+            if v in other:
+                if meet is None or other[v][1] < other[meet][1]:
+                    meet = v
+    return following, meet
+
+
+def shortest_path(compact, start, end, banned_nodes=frozenset(),
+                  banned_edges=frozenset()):
+    ''' the ids of a shortest chain of imports from start to end, or None '''
+    if start == end:
+        return [start]
+    if start in banned_nodes or end in banned_nodes:
+        return None
+
+    # node: (parent, depth) on each side
+    forward = {start: (None, 0)}
+    backward = {end: (None, 0)}
+    ahead = [start]
+    behind = [end]
+
+    meet = None
+    while ahead and behind and meet is None:
+        if len(ahead) <= len(behind):
+            ahead, meet = expand(
+                ahead, forward, backward, compact.imports,
+                banned_nodes, banned_edges, True
+            )
+        else:
+            behind, meet = expand(
+                behind, backward, forward, compact.imported_by,
+                banned_nodes, banned_edges, False
+            )
+
+    if meet is None:
+        return None
+
+    path = []
+    x = meet
+    while x is not None:
+        path.append(x)
+        x = forward[x][0]
+    path.reverse()
+    x = backward[meet][0]
+    while x is not None:
+        path.append(x)
+        x = backward[x][0]
+    return path
+
+
+def shortest_paths(compact, start, end, k=1):
+    ''' up to k of the shortest loop-free chains, shortest first '''
+    path = shortest_path(compact, start, end)
+    if path is None:
+        return []
+
+    found = [path]
+    candidates = []
+    seen = set([tuple(path)])
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(len(previous) - 1):
+            spur = previous[i]
+            root = previous[:i + 1]
+
+            banned_edges = set(
+                (p[i], p[i + 1]) for p in found
+                if len(p) > i + 1 and p[:i + 1] == root
+            )
+            spur_path = shortest_path(
+                compact, spur, end, frozenset(root[:-1]), banned_edges
+            )
+            if spur_path is None:
+                continue
+
+            path = root[:-1] + spur_path
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (len(path), path))
+
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[1])
+
+    return found
+
+
+# -----------------------------------------------------------------------------
+# Output
+
+def why_text(start, end, paths):
+    out = []
+    w = out.append
+    if not paths:
+        w('{} does not import {}\n'.format(start, end))
+    else:
+        w('Why {} imports {}:\n'.format(start, end))
+    for i, path in enumerate(paths, 1):
+        w('  {}. {} step{}\n'.format(
+            i, len(path) - 1, '' if len(path) == 2 else 's'))
+        for node in path:
+            w('\t{}\n'.format(node))
+    return ''.join(out)
+
+
+def why_dot(start, end, paths):
+    ''' the chains in one small graph, the shortest drawn heavier '''
+    out = []
+    w = out.append
+    w('digraph why {\n')
+    w('\trankdir=LR;\n')
+    w('\tnode [fontsize=10 shape="rect"]\n')
+    w('\tedge [fontsize=9]\n')
+    w('\n')
+
+    # Numbered, since basenames are not unique even on a few chains
+    names = {}
+    for path in paths:
+        for node in path:
+            if node in names:
+                continue
+            names[node] = 'n{}'.format(len(names))
+            label = node.modulename if isinstance(node, File) else node
+            style = ''
+            if node == start:
+                style = ' style=filled fillcolor=gold'
+            elif node == end:
+                style = ' style=filled fillcolor=salmon'
+            w('\t{} [label="{}"{}]\n'.format(names[node], label, style))
+
+    w('\n')
+    edges = set()
+    for i, path in enumerate(paths):
+        for a, b in zip(path, path[1:]):
+            if (a, b) not in edges:
+                edges.add((a, b))
+                w('\t{} -> {}{}\n'.format(
+                    names[a], names[b], ' [penwidth=2]' if i == 0 else ''
+                ))
+    w('}\n')
+    return ''.join(out)